@@ -39,6 +39,7 @@ setup(
         'plone.uuid',
         'setuptools',
         'six',
+        'zope.annotation',
         'zope.globalrequest',
     ],
     extras_require={
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""Caches used internally by plone.api methods."""
+
+from collections import OrderedDict
+from zope.annotation.interfaces import IAnnotations
+from zope.globalrequest import getRequest
+
+import threading
+import transaction
+import weakref
+
+
+# transaction -> {name: dict}, entries go away with their transaction
+_transaction_caches = weakref.WeakKeyDictionary()
+
+
+def get_transaction_cache(name):
+    """Get a dictionary that lives as long as the current transaction.
+
+    Every transaction gets its own set of dictionaries, so values never leak
+    into the next transaction, be it after a commit or an abort.
+
+    :param name: Name of the cache, usually the dotted name of its user.
+    :type name: string
+    :returns: Cache for the current transaction
+    :rtype: dict
+    """
+    txn = transaction.get()
+    caches = _transaction_caches.get(txn)
+    if caches is None:
+        caches = _transaction_caches[txn] = {}
+    return caches.setdefault(name, {})
+
+
+def get_request_cache(name, request=None):
+    """Get a dictionary that lives as long as the request.
+
+    Without a request, a new empty dictionary is returned every time, so
+    nothing gets cached.
+
+    :param name: Name of the cache, usually the dotted name of its user.
+    :type name: string
+    :param request: Request to store the cache on, defaults to the current
+        request.
+    :type request: request object
+    :returns: Cache for the request
+    :rtype: dict
+    """
+    if request is None:
+        request = getRequest()
+    if request is None:
+        return {}
+    annotations = IAnnotations(request, None)
+    if annotations is None:
+        return {}
+    return annotations.setdefault(name, {})
+
+
+class LRUCache(object):
+    """A bounded mapping which drops the least recently used entries.
+
+    It is safe to share between threads and keeps count of its hits and
+    misses.
+    """
+
+    def __init__(self, maxsize=1000):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    @property
+    def maxsize(self):
+        """The maximum number of entries kept."""
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, maxsize):
+        with self._lock:
+            self._maxsize = maxsize
+            self._shrink()
+
+    def _shrink(self):
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+
+    def get(self, key, default=None):
+        """Get an entry and mark it as most recently used."""
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Add or replace an entry, dropping the oldest ones if full."""
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            self._shrink()
+
+    def pop(self, key, default=None):
+        """Remove an entry and return its value."""
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def items(self):
+        """Get a copy of the entries, the oldest first."""
+        with self._lock:
+            return list(self._data.items())
+
+    def clear(self):
+        """Remove all entries and reset the counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
@@ -1,11 +1,21 @@
 # -*- coding: utf-8 -*-
 """Module that provides functionality for content manipulation."""
 
-from copy import copy as _copy
+from AccessControl import Unauthorized
+from AccessControl.SecurityManagement import getSecurityManager
+from Acquisition import aq_base
+from Acquisition import aq_chain
+from Acquisition import aq_inner
+from Acquisition import aq_parent
+from collections import deque
+from DateTime import DateTime
 from pkg_resources import DistributionNotFound
 from pkg_resources import get_distribution
 from pkg_resources import parse_version
 from plone.api import portal
+from plone.api.cache import get_request_cache
+from plone.api.cache import get_transaction_cache
+from plone.api.cache import LRUCache
 from plone.api.exc import InvalidParameterError
 from plone.api.validation import at_least_one_of
 from plone.api.validation import mutually_exclusive_parameters
@@ -13,15 +23,32 @@ from plone.api.validation import required_parameters
 from plone.app.linkintegrity.exceptions import LinkIntegrityNotificationException  # noqa
 from plone.app.uuid.utils import uuidToObject
 from plone.uuid.interfaces import IUUID
+from Products.CMFCore.permissions import AccessInactivePortalContent
+from Products.CMFCore.permissions import DeleteObjects
+from Products.CMFCore.permissions import ModifyPortalContent
+from Products.CMFCore.permissions import View
+from Products.CMFCore.WorkflowCore import ActionRaisedExceptionEvent
+from Products.CMFCore.WorkflowCore import ActionSucceededEvent
+from Products.CMFCore.WorkflowCore import ActionWillBeInvokedEvent
+from Products.CMFCore.WorkflowCore import ObjectDeleted
+from Products.CMFCore.WorkflowCore import ObjectMoved
 from Products.CMFCore.WorkflowCore import WorkflowException
+from Products.DCWorkflow.Transitions import TRIGGER_USER_ACTION
+from Products.ZCatalog.interfaces import ICatalogBrain
 from zope.component import getMultiAdapter
 from zope.component import getSiteManager
+from zope.component import queryMultiAdapter
+from zope.container.contained import notifyContainerModified
 from zope.container.interfaces import INameChooser
+from zope.event import notify
 from zope.interface import Interface
 from zope.interface import providedBy
 
 import random
+import six
+import sys
 import transaction
+import weakref
 
 
 try:
@@ -41,6 +68,31 @@ else:
 
 _marker = []
 
+_STATE_CACHE = 'plone.api.content.get_state'
+_VIEW_CACHE = 'plone.api.content.get_view'
+
+# Products.CMFPlacefulWorkflow stores its policies in this attribute on the
+# folders they apply to.
+_PLACEFUL_POLICY_ID = '.wf_policy_config'
+
+# workflow tool path -> (tool token, {chain key: workflow ids})
+_chain_cache = {}
+_CHAIN_CACHE_SIZE = 1000
+
+# workflow path -> (workflow token, reachability table)
+_paths_cache = {}
+# maximum number of alternative paths considered between two states
+_MAX_ROUTES = 10
+# maximum number of partial paths explored while looking for them
+_MAX_ROUTE_QUEUE = 1000
+
+# (site path, UID) -> physical path
+_uid_paths = LRUCache(maxsize=1000)
+
+# adapter registry -> (registry generation, {specifications: view names})
+_view_names_cache = weakref.WeakKeyDictionary()
+_VIEW_NAMES_CACHE_SIZE = 1000
+
 
 @required_parameters('container', 'type')
 @at_least_one_of('id', 'title')
@@ -162,7 +214,102 @@ def get(path=None, UID=None):
             return None  # When no object is found don't raise an error
 
     elif UID:
-        return uuidToObject(UID)
+        return _uuid_to_object(UID)
+
+
+def _uuid_to_object(uid):
+    """Get an object by its UID, remembering the path it was found at.
+
+    Paths found through the catalog are kept in a per-process LRU cache. A
+    cached path is only used if it still leads to an object with that UID,
+    and only if the current user may find that object in the catalog: it
+    must be viewable and, unless the user may access inactive content,
+    within its effective range. Otherwise None is returned, like the catalog
+    query would.
+    """
+    site = portal.get()
+    key = ('/'.join(site.getPhysicalPath()), uid)
+    path = _uid_paths.get(key)
+    if path is not None:
+        obj = site.unrestrictedTraverse(path, None)
+        if obj is not None and IUUID(obj, None) == uid:
+            if _is_findable(site, obj):
+                return obj
+            return None
+        _uid_paths.pop(key)
+
+    obj = uuidToObject(uid)
+    if obj is not None:
+        _uid_paths.set(key, '/'.join(obj.getPhysicalPath()))
+    return obj
+
+
+def _is_findable(site, obj):
+    """Check whether a restricted catalog query would find the object."""
+    sm = getSecurityManager()
+    if not sm.checkPermission(View, obj):
+        return False
+    if sm.checkPermission(AccessInactivePortalContent, site):
+        return True
+
+    # The catalog filters on its effectiveRange index, built from these
+    now = DateTime()
+    effective = getattr(obj, 'effective', None)
+    if callable(effective) and effective() > now:
+        return False
+    expires = getattr(obj, 'expires', None)
+    if callable(expires) and expires() < now:
+        return False
+    return True
+
+
+def _invalidate_uid_paths(obj):
+    """Drop the cached UID paths of the object and its descendants."""
+    path = '/'.join(obj.getPhysicalPath())
+    prefix = path + '/'
+    for key, cached_path in _uid_paths.items():
+        if cached_path == path or cached_path.startswith(prefix):
+            _uid_paths.pop(key)
+
+
+def get_uid_cache_info():
+    """Get the statistics of the cache used by :meth:`api.content.get` to
+    find objects by UID.
+
+    :returns: Number of cached paths (``size``), the maximum number kept
+        (``maxsize``) and the number of ``hits`` and ``misses`` since the
+        cache was last emptied.
+    :rtype: dict
+    :Example: :ref:`content_uid_cache_example`
+    """
+    return {
+        'size': len(_uid_paths),
+        'maxsize': _uid_paths.maxsize,
+        'hits': _uid_paths.hits,
+        'misses': _uid_paths.misses,
+    }
+
+
+@required_parameters('size')
+def set_uid_cache_size(size=None):
+    """Set how many paths the UID cache of :meth:`api.content.get` keeps.
+
+    The cache is per process, so this is best done at startup. When
+    shrinking, the least recently used paths are dropped right away.
+
+    :param size: [required] Maximum number of paths kept, 0 disables the
+        cache.
+    :type size: int
+    :raises:
+        :class:`~plone.api.exc.InvalidParameterError`
+    :Example: :ref:`content_uid_cache_example`
+    """
+    is_int = isinstance(size, six.integer_types) and not isinstance(size, bool)
+    if not is_int or size < 0:
+        raise InvalidParameterError(
+            'size must be a non-negative integer.',
+        )
+    _uid_paths.maxsize = size
 
 
 @required_parameters('source')
@@ -193,6 +340,7 @@ def move(source=None, target=None, id=None, safe_id=False):
     :Example: :ref:`content_move_example`
     """
     source_id = source.getId()
+    _invalidate_uid_paths(source)
 
     # If no target is given the object is probably renamed
     if target and source.aq_parent is not target:
@@ -231,6 +379,7 @@ def rename(obj=None, new_id=None, safe_id=False):
         new_id = chooser.chooseName(new_id, obj)
 
     if obj_id != new_id:
+        _invalidate_uid_paths(obj)
         container.manage_renameObject(obj_id, new_id)
     return container[new_id]
 
@@ -283,7 +432,12 @@ def copy(source=None, target=None, id=None, safe_id=False):
 
 @mutually_exclusive_parameters('obj', 'objects')
 @at_least_one_of('obj', 'objects')
-def delete(obj=None, objects=None, check_linkintegrity=True):
+def delete(
+    obj=None,
+    objects=None,
+    check_linkintegrity=True,
+    bulk_unindex=False,
+):
     """Delete the object(s).
 
     :param obj: Object that we want to delete.
@@ -293,9 +447,21 @@ def delete(obj=None, objects=None, check_linkintegrity=True):
     :param check_linkintegrity: Raise exception if there are
         linkintegrity-breaches.
     :type check_linkintegrity: boolean
+    :param bulk_unindex: When True, remove all ``portal_catalog`` records
+        under the path of each deleted object at once, found through the
+        path index, instead of unindexing every descendant through its own
+        events. No object events are fired for the deleted objects in this
+        mode, so everything else maintained by event subscribers, like the
+        Archetypes ``uid_catalog`` and ``reference_catalog`` or intids and
+        relations, keeps its entries. Only use it for content that has no
+        subscribers you rely on. On Plone versions checking link integrity
+        through events, it can not be combined with ``check_linkintegrity``.
+    :type bulk_unindex: boolean
 
     :raises:
         ValueError
+        :class:`~plone.api.exc.InvalidParameterError`
+        AccessControl.Unauthorized
         plone.app.linkintegrity.exceptions.LinkIntegrityNotificationException
 
     :Example: :ref:`content_delete_example`
@@ -306,20 +472,23 @@ def delete(obj=None, objects=None, check_linkintegrity=True):
     if not objects:
         return
 
-    if check_linkintegrity and NEW_LINKINTEGRITY:
-        site = portal.get()
-        linkintegrity_view = get_view(
-            name='delete_confirmation_info',
-            context=site,
-            request=site.REQUEST,
+    if bulk_unindex and check_linkintegrity and not NEW_LINKINTEGRITY:
+        # Old linkintegrity checks in event subscribers, which the bulk mode
+        # does not fire.
+        raise InvalidParameterError(
+            'Link integrity can not be checked when deleting with '
+            'bulk_unindex, pass check_linkintegrity=False.',
         )
 
-        # look for breaches and manually raise a exception
-        breaches = linkintegrity_view.get_breaches(objects)
-        if breaches:
-            raise LinkIntegrityNotificationException(
-                'Linkintegrity-breaches: {0}'.format(breaches),
-            )
+    if check_linkintegrity and NEW_LINKINTEGRITY:
+        _check_linkintegrity(objects)
+
+    for obj_ in objects:
+        _invalidate_uid_paths(obj_)
+
+    if bulk_unindex:
+        _delete_bulk_unindex(objects)
+        return
 
     for obj_ in objects:
         if not check_linkintegrity and not NEW_LINKINTEGRITY:
@@ -334,6 +503,173 @@ def delete(obj=None, objects=None, check_linkintegrity=True):
             obj_.aq_parent.manage_delObjects([obj_.getId()])
 
 
+def _delete_bulk_unindex(objects):
+    """Delete objects, dropping their catalog records by path prefix."""
+    catalog = portal.get_tool('portal_catalog')
+    sm = getSecurityManager()
+    for obj_ in objects:
+        if not sm.checkPermission(DeleteObjects, obj_):
+            raise Unauthorized(
+                'Do not have permissions to remove {0}'.format(
+                    '/'.join(obj_.getPhysicalPath()),
+                ),
+            )
+
+    for obj_ in objects:
+        # Collect the paths first, the result set is lazy.
+        paths = [
+            brain.getPath()
+            for brain in catalog.unrestrictedSearchResults(
+                path='/'.join(obj_.getPhysicalPath()),
+            )
+        ]
+        for path in paths:
+            catalog.uncatalog_object(path)
+
+        container = obj_.aq_parent
+        container._delObject(obj_.getId(), suppress_events=True)
+        notifyContainerModified(container)
+
+
+def _check_linkintegrity(objects):
+    """Raise LinkIntegrityNotificationException if deleting the objects
+    would break links.
+    """
+    site = portal.get()
+    linkintegrity_view = get_view(
+        name='delete_confirmation_info',
+        context=site,
+        request=site.REQUEST,
+    )
+
+    # look for breaches and manually raise a exception
+    breaches = linkintegrity_view.get_breaches(objects)
+    if breaches:
+        raise LinkIntegrityNotificationException(
+            'Linkintegrity-breaches: {0}'.format(breaches),
+        )
+
+
+@required_parameters('obj')
+def delete_tree(
+    obj=None,
+    chunk_size=1000,
+    progress=None,
+    check_linkintegrity=True,
+):
+    """Delete the object and all of its descendants in committed chunks.
+
+    The subtree is removed bottom-up: the deepest catalogued items are
+    deleted first, so every deletion only touches leaves and no huge
+    subtree is unindexed in a single transaction. A transaction is committed
+    after each chunk and the ZODB cache is garbage collected, so memory
+    stays bounded. If the operation is interrupted, calling it again on the
+    same object resumes where it stopped.
+
+    :param obj: [required] Object that we want to delete, together with its
+        descendants.
+    :type obj: Content object
+    :param chunk_size: Number of items deleted per transaction.
+    :type chunk_size: int
+    :param progress: Called after each committed chunk with the number of
+        items deleted so far and the number of items still to delete.
+    :type progress: callable
+    :param check_linkintegrity: Raise exception if there are
+        linkintegrity-breaches. Breaches are looked for before anything is
+        deleted, which old linkintegrity (Plone < 5.0b4) can not do, so it
+        must be False there.
+    :type check_linkintegrity: boolean
+    :raises:
+        :class:`~plone.api.exc.InvalidParameterError`,
+        plone.app.linkintegrity.exceptions.LinkIntegrityNotificationException
+    :Example: :ref:`content_delete_tree_example`
+    """
+    if chunk_size < 1:
+        raise InvalidParameterError('chunk_size must be a positive integer.')
+
+    if check_linkintegrity and not NEW_LINKINTEGRITY:
+        # Old linkintegrity only notices breaches in event subscribers, by
+        # then earlier chunks would already be committed.
+        raise InvalidParameterError(
+            'Link integrity can not be checked before deleting a tree, '
+            'pass check_linkintegrity=False.',
+        )
+
+    if check_linkintegrity:
+        # Checking the root is enough, the view also looks at all of the
+        # descendants of the objects it is given.
+        _check_linkintegrity([obj])
+
+    site = portal.get()
+    catalog = portal.get_tool('portal_catalog')
+    root_path = '/'.join(obj.getPhysicalPath())
+
+    # Deepest paths first, the object itself comes last.
+    paths = [
+        brain.getPath()
+        for brain in catalog.unrestrictedSearchResults(path=root_path)
+    ]
+    if root_path not in paths:
+        paths.append(root_path)
+    paths.sort(key=lambda path: path.count('/'), reverse=True)
+
+    connection = site._p_jar
+    deleted = 0
+    total = len(paths)
+    for start in range(0, total, chunk_size):
+        chunk = paths[start:start + chunk_size]
+        _delete_paths(site, catalog, chunk)
+        deleted += len(chunk)
+        transaction.commit()
+        if connection is not None:
+            connection.cacheGC()
+        if progress is not None:
+            progress(deleted, total - deleted)
+    _invalidate_uid_paths(obj)
+
+
+def _delete_paths(site, catalog, paths):
+    """Delete the objects at the given physical paths.
+
+    ``paths`` must be ordered so that children come before their parents.
+    Items are grouped per container so each container only receives a
+    single ``manage_delObjects`` call.
+    """
+    containers = []
+    ids_by_container = {}
+    for path in paths:
+        parent_path, obj_id = path.rsplit('/', 1)
+        if parent_path not in ids_by_container:
+            containers.append(parent_path)
+            ids_by_container[parent_path] = []
+        ids_by_container[parent_path].append(obj_id)
+
+    for parent_path in containers:
+        container = site.unrestrictedTraverse(parent_path, None)
+        ids = ids_by_container[parent_path]
+        existing = []
+        for obj_id in ids:
+            if container is not None and obj_id in container:
+                existing.append(obj_id)
+            else:
+                # Left over from an interrupted run, only the catalog
+                # still knows about it.
+                catalog.uncatalog_object(
+                    '{0}/{1}'.format(parent_path, obj_id),
+                )
+        if not existing:
+            continue
+        if NEW_LINKINTEGRITY:
+            container.manage_delObjects(existing)
+        else:
+            # old style ignoring breaches:
+            # we have to explicitly ignore the exception
+            try:
+                container.manage_delObjects(existing)
+            except LinkIntegrityNotificationException:
+                pass
+
+
 @required_parameters('obj')
 def get_state(obj=None, default=_marker):
     """Get the current workflow state of the object.
@@ -349,7 +685,11 @@ def get_state(obj=None, default=_marker):
     """
     workflow = portal.get_tool('portal_workflow')
 
-    if default is not _marker and not workflow.getWorkflowsFor(obj):
+    state = _get_review_state(obj, workflow)
+    if state is not None:
+        return state
+
+    if default is not _marker and not _get_workflows_for(obj, workflow):
         return default
 
     # This still raises WorkflowException when the workflow state is broken,
@@ -357,103 +697,506 @@ def get_state(obj=None, default=_marker):
     return workflow.getInfoFor(ob=obj, name='review_state')
 
 
-# work backwards from our end state
-def _find_path(maps, path, current_state, start_state):
-    paths = []
-    # current_state could not be on maps if it only has outgoing
-    # transitions. i.e an initial state you are not able to return to.
-    if current_state not in maps:
-        return
+@required_parameters('objects')
+def get_states(objects=None):
+    """Get the current workflow states of many objects at once.
 
-    for new_transition, from_states in maps[current_state]:
-        next_path = _copy(path)
-        if new_transition in path:
-            # Don't go in a circle
-            continue
+    Review states are read from the ``review_state`` catalog metadata, so
+    catalogued objects are never woken up. Only objects that are not in the
+    catalog are asked through the workflow tool.
 
-        next_path.insert(0, new_transition)
-        if start_state in from_states:
-            paths.append(next_path)
+    :param objects: [required] Objects or catalog brains that we want to get
+        the states for.
+    :type objects: List of content objects or catalog brains
+    :returns: Mapping of UID to workflow state. Objects without a UID, like
+        the portal, are keyed by their physical path joined with ``/``
+        instead. The state is None for objects without a workflow.
+    :rtype: dict
+    :Example: :ref:`content_get_states_example`
+    """
+    catalog = portal.get_tool('portal_catalog')
+    has_metadata = 'review_state' in catalog.schema()
+
+    states = {}
+    uncatalogued = {}
+    for item in objects:
+        if ICatalogBrain.providedBy(item):
+            if has_metadata:
+                states[item.UID] = item.review_state or None
+            else:
+                uncatalogued[item.UID] = item.getObject()
             continue
 
-        for state in from_states:
-            recursive_paths = _find_path(
-                maps,
-                next_path,
-                state,
-                start_state,
-            )
-            if recursive_paths:
-                paths.append(recursive_paths)
+        uid = IUUID(item, None)
+        if uid is None:
+            # Not catalogued by UID either, ask the workflow tool
+            path = '/'.join(item.getPhysicalPath())
+            states[path] = get_state(obj=item, default=None)
+        else:
+            uncatalogued[uid] = item
+
+    if uncatalogued and has_metadata:
+        for brain in catalog.unrestrictedSearchResults(
+            UID=list(uncatalogued),
+        ):
+            states[brain.UID] = brain.review_state or None
+            del uncatalogued[brain.UID]
+
+    for uid, obj in uncatalogued.items():
+        states[uid] = get_state(obj=obj, default=None)
+    return states
+
+
+def _get_review_state(obj, workflow):
+    """Read the review state straight from the workflow status of the object.
+
+    The workflow and status record that hold the state are memoized for the
+    current transaction, so the workflow chain of an object is resolved only
+    once. A memoized record is only used while it still is the latest status
+    of the object, which is not the case anymore after a transition.
+
+    Return None if no status holds a review state; the caller then falls back
+    to the workflow tool.
+    """
+    memo = get_transaction_cache(_STATE_CACHE)
+    key = id(aq_base(obj))
+    cached = memo.get(key)
+    if cached is not None:
+        wf_id, status = cached
+        if workflow.getStatusOf(wf_id, obj) is status:
+            return status['review_state']
+
+    for wf_id in _get_chain(obj, workflow):
+        status = workflow.getStatusOf(wf_id, obj)
+        if status and status.get('review_state'):
+            memo[key] = (wf_id, status)
+            return status['review_state']
 
-    return len(paths) and min(paths, key=len) or None
 
+def _invalidate_review_state(obj):
+    """Forget the memoized review state of the object."""
+    get_transaction_cache(_STATE_CACHE).pop(id(aq_base(obj)), None)
 
-def _wf_transitions_for(workflow, from_state, to_state):
-    """Get a list of transition IDs required to transition
-    from ``from_state`` to ``to_state``.
 
-    :param workflow: Workflow object which contains states and transitions
-    :type workflow: Workflow object
-    :param from_state: Current workflow state
+def _persistent_token(ob):
+    """Identify the committed version of a persistent object.
+
+    Return None if the object has uncommitted changes.
+    """
+    if ob is None:
+        return ()
+    # A ghost keeps the serial it had before another connection changed it,
+    # only loading its state brings the current one.
+    activate = getattr(ob, '_p_activate', None)
+    if activate is not None:
+        activate()
+    if getattr(ob, '_p_changed', False) or getattr(ob, '_p_oid', 0) is None:
+        return None
+    return (getattr(ob, '_p_oid', None), getattr(ob, '_p_serial', None))
+
+
+def _placeful_policies(obj):
+    """Get a cache key for the placeful workflow policies that apply to obj.
+
+    Return None if one of them has uncommitted changes.
+    """
+    site = portal.get()
+    policies = []
+    current = aq_inner(obj)
+    start_here = True
+    while current is not None:
+        config = getattr(aq_base(current), _PLACEFUL_POLICY_ID, None)
+        if config is not None:
+            token = _persistent_token(config)
+            definitions = _policy_definitions(site, config)
+            if token is None or definitions is None:
+                return None
+            policies.append((token, definitions, start_here))
+        if aq_base(current) is aq_base(site):
+            break
+        start_here = False
+        current = aq_parent(aq_inner(current))
+    return tuple(policies)
+
+
+def _policy_definitions(site, config):
+    """Identify the policy definitions a placeful policy config refers to.
+
+    The config only holds the ids of its policies, the chains are kept by the
+    definitions in portal_placeful_workflow. Return None if one of them has
+    uncommitted changes.
+    """
+    placeful_tool = getattr(site, 'portal_placeful_workflow', None)
+    tokens = []
+    for policy_id in (config.getPolicyInId(), config.getPolicyBelowId()):
+        policy = None
+        if placeful_tool is not None and policy_id:
+            policy = aq_base(placeful_tool.getWorkflowPolicyById(policy_id))
+        for part in (policy, getattr(policy, '_chains_by_type', None)):
+            token = _persistent_token(part)
+            if token is None:
+                return None
+            tokens.append(token)
+    return tuple(tokens)
+
+
+def _get_chain(obj, workflow):
+    """Get the ids of the workflows in the chain of the object.
+
+    Chains are cached per portal_type, provided interfaces and placeful
+    workflow policies of the object. The cache is flushed when the workflow
+    tool, its chains or any of the policies are changed; while they have
+    uncommitted changes, chains are always resolved by the workflow tool.
+    """
+    tool_token = _persistent_token(aq_base(workflow))
+    chains_token = _persistent_token(
+        getattr(aq_base(workflow), '_chains_by_type', None),
+    )
+    policies = _placeful_policies(obj)
+    if tool_token is None or chains_token is None or policies is None:
+        return tuple(workflow.getChainFor(obj))
+
+    token = (tool_token, chains_token)
+    cache_key = workflow.getPhysicalPath()
+    cached = _chain_cache.get(cache_key)
+    if cached is None or cached[0] != token:
+        cached = _chain_cache[cache_key] = (token, {})
+    chains = cached[1]
+
+    key = (
+        getattr(aq_base(obj), 'portal_type', None),
+        providedBy(aq_base(obj)),
+        policies,
+    )
+    chain = chains.get(key)
+    if chain is None:
+        chain = tuple(workflow.getChainFor(obj))
+        if len(chains) >= _CHAIN_CACHE_SIZE:
+            chains.clear()
+        chains[key] = chain
+    return chain
+
+
+def _get_workflows_for(obj, workflow):
+    """Get the workflow objects in the chain of the object."""
+    workflows = []
+    for wf_id in _get_chain(obj, workflow):
+        wf = workflow.getWorkflowById(wf_id)
+        if wf is not None:
+            workflows.append(wf)
+    return workflows
+
+
+@required_parameters('obj')
+def get_reachable_states(obj=None, from_state=None):
+    """Get the workflow states that can be reached from a state.
+
+    Reachability is taken from the transitions defined in the workflows of
+    the object; transition guards are not evaluated.
+
+    :param obj: [required] Object whose workflows are used.
+    :type obj: Content object
+    :param from_state: State to start from. If not given, the current state
+        of the object is used.
     :type from_state: string
-    :param to_state: Desired workflow state
-    :type to_state: string
-    :returns: A list of transitions
-    :rtype: list
+    :returns: Ids of the reachable states, not including ``from_state``
+    :rtype: List of strings
+    :Example: :ref:`content_get_reachable_states_example`
+    """
+    workflow = portal.get_tool('portal_workflow')
+    reachable = set()
+    for wf in _get_workflows_for(obj, workflow):
+        state = from_state
+        if state is None:
+            status = workflow.getStatusOf(wf.getId(), obj)
+            if not status or not status.get('review_state'):
+                continue
+            state = status['review_state']
+        reachable.update(_workflow_paths(wf).get(state, {}))
+    return sorted(reachable)
+
+
+def _workflow_token(wf):
+    """Identify the committed version of a workflow definition.
+
+    Return None if any part of it has uncommitted changes.
+    """
+    parts = [wf, wf.states, wf.transitions]
+    parts.extend(wf.states.objectValues())
+    parts.extend(wf.transitions.objectValues())
+    tokens = tuple(_persistent_token(aq_base(part)) for part in parts)
+    if None in tokens:
+        return None
+    return tokens
+
+
+def _workflow_graph(wf):
+    """Map every state of a workflow to its (transition, new state) exits."""
+    graph = {}
+    for state in wf.states.objectValues():
+        exits = graph[state.getId()] = []
+        for transition_id in state.getTransitions():
+            tdef = wf.transitions.get(transition_id, None)
+            if tdef is not None and tdef.new_state_id:
+                exits.append((transition_id, tdef.new_state_id))
+    return graph
+
+
+def _compute_workflow_paths(graph):
+    """Compute the shortest transition path between all pairs of states."""
+    paths = {}
+    for start in graph:
+        reached = paths[start] = {}
+        queue = deque([(start, ())])
+        while queue:
+            state, path = queue.popleft()
+            for transition_id, new_state in graph.get(state, ()):
+                if new_state == start or new_state in reached:
+                    continue
+                reached[new_state] = path + (transition_id, )
+                queue.append((new_state, reached[new_state]))
+    return paths
+
+
+def _compute_routes(graph, from_state, to_state):
+    """Compute the transition paths without cycles between two states,
+    shortest first.
+
+    Only states from which ``to_state`` can be reached are explored, paths
+    are never longer than the number of states and the search gives up
+    after ``_MAX_ROUTE_QUEUE`` partial paths, so workflows with many
+    interconnected states can not make it run for long.
     """
-    exit_state_maps = {}
-    for state in workflow.states.objectValues():
-        for transition in state.getTransitions():
-            exit_state_maps.setdefault(transition, [])
-            exit_state_maps[transition].append(state.getId())
-
-    transition_maps = {}
-    for transition in workflow.transitions.objectValues():
-        value = (
-            transition.getId(),
-            exit_state_maps.get(transition.getId(), []),
+    # states from which to_state can be reached
+    leading = set([to_state])
+    changed = True
+    while changed:
+        changed = False
+        for state, exits in graph.items():
+            if state in leading:
+                continue
+            if any(new_state in leading for _, new_state in exits):
+                leading.add(state)
+                changed = True
+    if from_state not in leading:
+        return []
+
+    routes = []
+    explored = 0
+    queue = deque([(from_state, (), (from_state, ))])
+    while queue and len(routes) < _MAX_ROUTES:
+        state, path, visited = queue.popleft()
+        if len(path) >= len(graph):
+            continue
+        for transition_id, new_state in graph.get(state, ()):
+            if new_state in visited or new_state not in leading:
+                continue
+            if new_state == to_state:
+                routes.append(path + (transition_id, ))
+            elif explored < _MAX_ROUTE_QUEUE:
+                explored += 1
+                queue.append((
+                    new_state,
+                    path + (transition_id, ),
+                    visited + (new_state, ),
+                ))
+    return routes[:_MAX_ROUTES]
+
+
+def _workflow_table(wf):
+    """Get the precomputed reachability information of a workflow.
+
+    ``paths`` maps every state to the states that can be reached from it,
+    each with the shortest list of transitions leading there. ``routes`` is
+    filled on demand with all paths between two states. The table is
+    computed once per workflow definition and recomputed when the workflow
+    changes.
+    """
+    token = _workflow_token(wf)
+    if token is not None:
+        cached = _paths_cache.get(wf.getPhysicalPath())
+        if cached is not None and cached[0] == token:
+            return cached[1]
+
+    graph = _workflow_graph(wf)
+    table = {
+        'graph': graph,
+        'paths': _compute_workflow_paths(graph),
+        'routes': {},
+    }
+    if token is not None:
+        _paths_cache[wf.getPhysicalPath()] = (token, table)
+    return table
+
+
+def _workflow_paths(wf):
+    """Get the shortest paths table of a workflow."""
+    return _workflow_table(wf)['paths']
+
+
+def _workflow_routes(wf, from_state, to_state):
+    """Get all paths from ``from_state`` to ``to_state``, shortest first."""
+    table = _workflow_table(wf)
+    key = (from_state, to_state)
+    routes = table['routes'].get(key)
+    if routes is None:
+        routes = table['routes'][key] = _compute_routes(
+            table['graph'],
+            from_state,
+            to_state,
         )
-        if transition.new_state_id not in transition_maps:
-            transition_maps[transition.new_state_id] = [value]
-        else:
-            transition_maps[transition.new_state_id].append(value)
+    return routes
+
+
+def _can_reach(obj, workflow, to_state):
+    """Check if any workflow of the object leads to ``to_state``."""
+    for wf in _get_workflows_for(obj, workflow):
+        status = workflow.getStatusOf(wf.getId(), obj)
+        if not status or not status.get('review_state'):
+            continue
+        state = status['review_state']
+        if state == to_state or to_state in _workflow_paths(wf).get(state, {}):
+            return True
+    return False
 
-    if to_state not in transition_maps:
-        # impossible to reach via this workflow
-        return None
 
-    return _find_path(transition_maps, [], to_state, from_state)
+def _check_guards(wf, obj, route, **kwargs):
+    """Evaluate the guards of the user triggered transitions of a route
+    against the object in its current state and the current user.
+
+    :returns: Number of transitions that pass, counted from the start of
+        the route.
+    """
+    check = getattr(wf, '_checkTransitionGuard', None)
+    passed = 0
+    for transition_id in route:
+        tdef = wf.transitions.get(transition_id, None)
+        if tdef is None:
+            break
+        if tdef.trigger_type == TRIGGER_USER_ACTION and check is not None:
+            if not check(tdef, obj, **kwargs):
+                break
+        passed += 1
+    return passed
+
+
+def _plan_route(wf, obj, from_state, to_state, **kwargs):
+    """Choose the route to take from ``from_state`` to ``to_state``.
+
+    Guards are checked before the object is touched: the shortest route
+    whose guards all pass is preferred. Guards of later steps can only be
+    checked against the current state of the object, so if no route passes
+    completely, the shortest route whose first step is allowed is taken.
+    Return None if no route can even be started.
+    """
+    fallback = None
+    for route in _workflow_routes(wf, from_state, to_state):
+        passed = _check_guards(wf, obj, route, **kwargs)
+        if passed == len(route):
+            return route
+        if passed and fallback is None:
+            fallback = route
+    return fallback
+
+
+def _run_route(obj, workflow, wf, route, to_state, **kwargs):
+    """Execute the transitions of a route within one savepoint.
+
+    The transitions are run through the workflow itself instead of the
+    workflow tool, which would reindex the object and its security after
+    every step; the same events are fired, but the object is reindexed only
+    once, after the last step. If the route can not be completed, the
+    savepoint is rolled back so the object is not left halfway.
+    """
+    def current_state():
+        status = workflow.getStatusOf(wf.getId(), obj)
+        return status and status.get('review_state')
+
+    workflows = _get_workflows_for(obj, workflow)
+    savepoint = transaction.savepoint(optimistic=True)
+    try:
+        for transition_id in route:
+            if current_state() == to_state:
+                break
+            tdef = wf.transitions.get(transition_id)
+            if tdef.trigger_type != TRIGGER_USER_ACTION:
+                # Automatic transitions fire by themselves, once their
+                # guard allows them to.
+                continue
+            if not wf.isActionSupported(obj, transition_id, **kwargs):
+                break
+            obj = _do_action(workflows, wf, obj, transition_id, **kwargs)
+            if obj is None:
+                # A transition script deleted the object, which is its
+                # intended effect; there is nothing left to reindex.
+                return
+    except WorkflowException:
+        pass
+    except Unauthorized:
+        savepoint.rollback()
+        raise
+
+    if current_state() != to_state:
+        savepoint.rollback()
+        return
+
+    workflow._reindexWorkflowVariables(obj)
+
+
+def _do_action(workflows, wf, obj, transition_id, **kwargs):
+    """Run a transition, notifying like the workflow tool does, but without
+    reindexing the object.
+
+    Return the object to continue with, which differs from ``obj`` if the
+    transition moved it, or None if the transition deleted it.
+    """
+    for w in workflows:
+        w.notifyBefore(obj, transition_id)
+        notify(ActionWillBeInvokedEvent(obj, w, transition_id))
+    try:
+        result = wf.doActionFor(obj, transition_id, **kwargs)
+    except ObjectDeleted as e:
+        result = e.getResult()
+        new_obj = None
+    except ObjectMoved as e:
+        result = e.getResult()
+        obj = new_obj = e.getNewObject()
+    except Exception:
+        exc = sys.exc_info()
+        try:
+            for w in workflows:
+                w.notifyException(obj, transition_id, exc)
+                notify(ActionRaisedExceptionEvent(obj, w, transition_id, exc))
+            six.reraise(*exc)
+        finally:
+            exc = None
+    else:
+        new_obj = obj
+    for w in workflows:
+        w.notifySuccess(obj, transition_id, result)
+        notify(ActionSucceededEvent(obj, w, transition_id, result))
+    return new_obj
 
 
 def _transition_to(obj, workflow, to_state, **kwargs):
     # move from the current state to the given state
-    # via any route we can find
-    for wf in workflow.getWorkflowsFor(obj):
+    # via the best route whose guards allow it
+    for wf in _get_workflows_for(obj, workflow):
         status = workflow.getStatusOf(wf.getId(), obj)
         if not status or not status.get('review_state'):
             continue
-        if status['review_state'] == to_state:
+        from_state = status['review_state']
+        if from_state == to_state:
             return
-
-        transitions = _wf_transitions_for(
-            wf,
-            status['review_state'],
-            to_state,
-        )
-        if not transitions:
+        if to_state not in _workflow_paths(wf).get(from_state, {}):
+            # this workflow can not lead there, another one of the chain may
             continue
 
-        for transition in transitions:
-            try:
-                workflow.doActionFor(obj, transition, **kwargs)
-            except WorkflowException:
-                # take into account automatic transitions.
-                # If the transitions list that are being iterated over
-                # have automatic transitions they need to be skipped
-                if get_state(obj) == to_state:
-                    break
+        route = _plan_route(wf, obj, from_state, to_state, **kwargs)
+        if not route:
+            continue
 
+        _run_route(obj, workflow, wf, route, to_state, **kwargs)
         break
 
 
@@ -463,7 +1206,10 @@ def _transition_to(obj, workflow, to_state, **kwargs):
 def transition(obj=None, transition=None, to_state=None, **kwargs):
     """Perform a workflow transition for the object or attempt to perform
     workflow transitions on the object to reach the given state.
-    The later will not guarantee that transition guards conditions can be met.
+    The later picks the shortest path whose transition guards are met by the
+    current user. Guards of later steps can only be checked against the
+    current state of the object, so they are not guaranteed to be met; if a
+    step fails, all steps taken so far are rolled back.
 
     Accepts kwargs to supply to the workflow policy in use, such as "comment"
 
@@ -493,45 +1239,120 @@ def transition(obj=None, transition=None, to_state=None, **kwargs):
                 'Valid transitions are:\n'
                 '{1}'.format(transition, '\n'.join(sorted(transitions))),
             )
+        finally:
+            _invalidate_review_state(obj)
     else:
-        _transition_to(obj, workflow, to_state, **kwargs)
+        error = InvalidParameterError(
+            'Could not find workflow to set state to {0} on {1}'.format(
+                to_state,
+                obj,
+            ),
+        )
+        # Fail early if no workflow leads to the requested state.
+        if not _can_reach(obj, workflow, to_state):
+            raise error
+        try:
+            _transition_to(obj, workflow, to_state, **kwargs)
+        finally:
+            _invalidate_review_state(obj)
         if workflow.getInfoFor(obj, 'review_state') != to_state:
-            raise InvalidParameterError(
-                'Could not find workflow to set state to {0} on {1}'.format(
-                    to_state,
-                    obj,
-                ),
-            )
+            raise error
 
 
-@required_parameters('obj')
-def disable_roles_acquisition(obj=None):
+@mutually_exclusive_parameters('obj', 'objects')
+@at_least_one_of('obj', 'objects')
+def disable_roles_acquisition(obj=None, objects=None):
     """Disable acquisition of local roles on given obj.
     Set __ac_local_roles_block__ = 1 on obj.
 
-    :param obj: [required] Context object to block the acquisition on.
+    :param obj: Context object to block the acquisition on.
     :type obj: Content object
+    :param objects: Context objects to block the acquisition on. The flag is
+        set on all of them first, then object security is reindexed once per
+        topmost object.
+    :type objects: List of content objects
+    :raises:
+        AccessControl.Unauthorized
     :Example: :ref:`content_disable_roles_acquisition_example`
     """
-    plone_utils = portal.get_tool('plone_utils')
-    plone_utils.acquireLocalRoles(obj, status=0)
+    if obj is not None:
+        plone_utils = portal.get_tool('plone_utils')
+        plone_utils.acquireLocalRoles(obj, status=0)
+    else:
+        _set_roles_acquisition(objects, block=1)
 
 
-@required_parameters('obj')
-def enable_roles_acquisition(obj=None):
+@mutually_exclusive_parameters('obj', 'objects')
+@at_least_one_of('obj', 'objects')
+def enable_roles_acquisition(obj=None, objects=None):
     """Enable acquisition of local roles on given obj.
     Set __ac_local_roles_block__ = 0 on obj.
 
-    :param obj: [required] Context object to enable the acquisition on.
+    :param obj: Context object to enable the acquisition on.
     :type obj: Content object
+    :param objects: Context objects to enable the acquisition on. The flag is
+        set on all of them first, then object security is reindexed once per
+        topmost object.
+    :type objects: List of content objects
+    :raises:
+        AccessControl.Unauthorized
     :Example: :ref:`content_enable_roles_acquisition_example`
     """
-    plone_utils = portal.get_tool('plone_utils')
-    plone_utils.acquireLocalRoles(obj, status=1)
+    if obj is not None:
+        plone_utils = portal.get_tool('plone_utils')
+        plone_utils.acquireLocalRoles(obj, status=1)
+    else:
+        _set_roles_acquisition(objects, block=None)
+
+
+def _set_roles_acquisition(objects, block):
+    """Set the local roles block flag like ``plone_utils.acquireLocalRoles``
+    does, but reindex the security of the changed objects only once per
+    topmost object.
+    """
+    sm = getSecurityManager()
+    for obj_ in objects:
+        if not sm.checkPermission(ModifyPortalContent, obj_):
+            raise Unauthorized(
+                'Do not have permissions to modify {0}'.format(
+                    '/'.join(obj_.getPhysicalPath()),
+                ),
+            )
+
+    changed = []
+    for obj_ in objects:
+        blocked = getattr(aq_base(obj_), '__ac_local_roles_block__', None)
+        if bool(blocked) == bool(block):
+            continue
+        obj_.__ac_local_roles_block__ = block
+        changed.append(obj_)
+    _reindex_security(changed)
+
+
+def _reindex_security(objects):
+    """Reindex the security of objects and their descendants.
+
+    Objects below another given object are covered by the reindexing of
+    their ancestor, so every subtree is only reindexed once.
+    """
+    by_path = {}
+    for obj_ in objects:
+        by_path['/'.join(obj_.getPhysicalPath())] = obj_
+
+    topmost = set()
+    for path in sorted(by_path, key=lambda path: path.count('/')):
+        parts = path.split('/')
+        if any(
+            '/'.join(parts[:index]) in topmost
+            for index in range(1, len(parts))
+        ):
+            continue
+        topmost.add(path)
+        by_path[path].reindexObjectSecurity()
 
 
 @required_parameters('name', 'context', 'request')
-def get_view(name=None, context=None, request=None):
+def get_view(name=None, context=None, request=None, cached=False):
     """Get a BrowserView object.
 
     :param name: [required] Name of the view.
@@ -540,25 +1361,41 @@ def get_view(name=None, context=None, request=None):
     :type context: context object
     :param request: [required] Request on which to get view.
     :type request: request object
+    :param cached: Reuse the view already created for the same name and
+        context during this request.
+    :type cached: bool
     :raises:
         :class:`~plone.api.exc.MissingParameterError`,
         :class:`~plone.api.exc.InvalidParameterError`
     :Example: :ref:`content_get_view_example`
     """
+    if cached:
+        views = get_request_cache(_VIEW_CACHE, request)
+        # The acquisition chain is part of the key, so the same object
+        # acquired through another path gets its own view. The cached view
+        # holds on to its context, so the ids can not be reused meanwhile.
+        key = (
+            name,
+            tuple(id(aq_base(ob)) for ob in aq_chain(context)),
+            providedBy(request),
+        )
+        view = views.get(key)
+        if view is None:
+            view = views[key] = _get_view(name, context, request)
+        return view
+    return _get_view(name, context, request)
+
+
+def _get_view(name, context, request):
     # We do not use exceptionhandling to detect if the requested view is
     # available, because the __init__ of said view will contain
     # errors in client code.
-
-    # Get all available views...
-    sm = getSiteManager()
-    available_views = sm.adapters.lookupAll(
-        required=(providedBy(context), providedBy(request)),
-        provided=Interface,
-    )
-    # and get their names.
-    available_view_names = [view[0] for view in available_views]
+    view = queryMultiAdapter((context, request), name=name)
+    if view is not None:
+        return view
 
     # Raise an error if the requested view is not available.
+    available_view_names = _get_view_names(context, request)
     if name not in available_view_names:
         raise InvalidParameterError(
             "Cannot find a view with name '{name}'.\n"
@@ -571,6 +1408,34 @@ def get_view(name=None, context=None, request=None):
     return getMultiAdapter((context, request), name=name)
 
 
+def _get_view_names(context, request):
+    """Get the names of all views available for context and request.
+
+    The names are cached per pair of interface specifications, until the
+    component registry changes.
+    """
+    adapters = getSiteManager().adapters
+    cached = _view_names_cache.get(adapters)
+    if cached is None or cached[0] != adapters._generation:
+        cached = (adapters._generation, {})
+        _view_names_cache[adapters] = cached
+    names = cached[1]
+
+    key = (providedBy(context), providedBy(request))
+    view_names = names.get(key)
+    if view_names is None:
+        view_names = frozenset(
+            view[0] for view in adapters.lookupAll(
+                required=key,
+                provided=Interface,
+            )
+        )
+        if len(names) >= _VIEW_NAMES_CACHE_SIZE:
+            names.clear()
+        names[key] = view_names
+    return view_names
+
+
 @required_parameters('obj')
 def get_uuid(obj=None):
     """Get the object's Universally Unique IDentifier (UUID).
@@ -586,6 +1451,33 @@ def get_uuid(obj=None):
     return IUUID(obj)
 
 
+@required_parameters('objects')
+def get_uuids(objects=None):
+    """Get the UUIDs of many objects at once.
+
+    UUIDs of catalog brains are read from the ``UID`` catalog metadata, so
+    the objects are never woken up.
+
+    :param objects: [required] Objects or catalog brains we want the UUIDs of.
+    :type objects: List of content objects or catalog brains
+    :returns: UUIDs in the order of the given objects
+    :rtype: list
+    :raises:
+        ValueError
+    :Example: :ref:`content_get_uuids_example`
+    """
+    uuids = []
+    for item in objects:
+        if ICatalogBrain.providedBy(item):
+            uuid = getattr(item, 'UID', None)
+            if uuid:
+                uuids.append(uuid)
+                continue
+            item = item.getObject()
+        uuids.append(IUUID(item))
+    return uuids
+
+
 def find(context=None, depth=None, **kwargs):
     """Find content in the portal.
 
@@ -4,7 +4,6 @@ from AccessControl.SecurityManagement import newSecurityManager
 from AccessControl.SecurityManagement import setSecurityManager
 from App.config import getConfiguration
 from contextlib import closing
-from contextlib import contextmanager
 from pkg_resources import get_distribution
 from plone.api import portal
 from plone.api.exc import InvalidParameterError
@@ -14,6 +13,7 @@ from plone.api.validation import mutually_exclusive_parameters
 from plone.api.validation import required_parameters
 from zope.globalrequest import getRequest
 
+import threading
 import traceback
 import Zope2
 
@@ -32,6 +32,14 @@ def adopt_user(username=None, user=None):
     :type username: string
     :Example: :ref:`env_adopt_user_example`
     """
+    return _adopt_user(_get_wrapped_user(username=username, user=user))
+
+
+def _get_wrapped_user(username=None, user=None):
+    """Get the user object out of the acl_users it is defined in.
+
+    :raises: UserNotFoundError if there is no user with the given username.
+    """
     # Grab the user object out of acl_users because this function
     # accepts 'user' objects that are actually things like MemberData
     # objects, which AccessControl isn't so keen on.
@@ -60,11 +68,10 @@ def adopt_user(username=None, user=None):
         else:
             raise UserNotFoundError
 
-    return _adopt_user(user)
+    return user
 
 
-@contextmanager
-def _adopt_user(user):
+class _adopt_user(object):
     # Fortunately, AccessControl makes this fairly easy.
 
     # One reference to the current user is held by the security
@@ -74,20 +81,46 @@ def _adopt_user(user):
     # Use getSecurityManager() to take a reference to the existing
     # security manager object. Use newSecurityManager() to replace it
     # with a new one whose context refers to the new user object.
-    # Run the block, then put the original security manager back.
+    # Run the block, then put the original security manager back, even if
+    # the block raised.
+
+    __slots__ = ('_user', )
+
+    def __init__(self, user):
+        self._user = user
+
+    def __enter__(self):
+        _replaced_security_managers.stack.append(getSecurityManager())
+        newSecurityManager(getRequest(), self._user)
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        setSecurityManager(_replaced_security_managers.stack.pop())
+
+
+class _SecurityManagerStack(threading.local):
+    """The security managers replaced by ``_adopt_user``, latest last.
+
+    Security managers are per thread, and so is this stack. Blocks are
+    exited in reverse order of entering them, so one stack serves all
+    ``_adopt_user`` instances, even ones entered again while active or
+    shared between threads.
+    """
 
-    old_security_manager = getSecurityManager()
-    newSecurityManager(getRequest(), user)
+    def __init__(self):
+        self.stack = []
 
-    yield
 
-    setSecurityManager(old_security_manager)
+_replaced_security_managers = _SecurityManagerStack()
 
 
 @required_parameters('roles')
 def adopt_roles(roles=None):
     """Context manager for temporarily switching roles.
 
+    The returned context manager can be entered again and again, so a
+    tight loop can create it once and reuse it.
+
     :param roles: New roles to gain inside block. Existing roles will be lost.
     :type roles: list of strings
     :Example: :ref:`env_adopt_roles_example`
@@ -98,39 +131,42 @@ def adopt_roles(roles=None):
     if not roles:
         raise InvalidParameterError("Can't set an empty set of roles.")
 
-    return _adopt_roles(roles)
+    return _GlobalRoleOverridingContext(roles)
 
 
-@contextmanager
-def _adopt_roles(roles):
+class _GlobalRoleOverridingContext(object):
     # Okay, this is fun. Start by reading AccessControl/interfaces.py
 
     # ISecurityManager has a pair of methods addContext and removeContext,
-    # which are used here surrounding the block ("yield" in @contextmanager
-    # executes the body of the "with" block).
+    # which are used here surrounding the block (__enter__ and __exit__
+    # of this context manager).
 
     # addContext/removeContext add/pop items from a stack of security_contexts
     # Only the uppermost object in the stack is consulted during any given
     # permission check.
 
     # If the stack is empty, the default security policy gets used.
-    overriding_context = _GlobalRoleOverridingContext(roles)
-
-    security_manager = getSecurityManager()
-    security_manager.addContext(overriding_context)
-
-    yield
-
-    security_manager.removeContext(overriding_context)
-
 
-class _GlobalRoleOverridingContext(object):
     # ZopeSecurityPolicy will use security_context._proxy_roles in place of
     # the roles that would normally be active, provided that it happens to
     # consider the security_context object to be relevant.
 
+    # The instance keeps no state besides the roles, so it may be entered
+    # again while it is active and shared between threads: security managers
+    # are per thread, and removeContext drops the uppermost occurrence of the
+    # instance from the stack of the current thread's security manager.
+
+    __slots__ = ('_proxy_roles', )
+
     def __init__(self, roles):
-        self._proxy_roles = roles
+        self._proxy_roles = tuple(roles)
+
+    def __enter__(self):
+        getSecurityManager().addContext(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        getSecurityManager().removeContext(self)
 
     # ZopeSecurityPolicy decides if a security context is relevant as follows:
 
@@ -4,11 +4,13 @@
 from plone.api import portal
 from plone.api.exc import GroupNotFoundError
 from plone.api.exc import UserNotFoundError
+from plone.api.user import _get_local_roles
+from plone.api.user import _grant_local_roles
+from plone.api.user import _invalidate_members
 from plone.api.user import get as user_get
 from plone.api.validation import at_least_one_of
 from plone.api.validation import mutually_exclusive_parameters
 from plone.api.validation import required_parameters
-from Products.PlonePAS.interfaces.plugins import ILocalRolesPlugin
 
 
 @required_parameters('groupname')
@@ -125,7 +127,9 @@ def delete(groupname=None, group=None):
     if group:
         groupname = group.id
 
-    return group_tool.removeGroup(groupname)
+    result = group_tool.removeGroup(groupname)
+    _invalidate_members()
+    return result
 
 
 @mutually_exclusive_parameters('groupname', 'group')
@@ -164,6 +168,7 @@ def add_user(groupname=None, group=None, username=None, user=None):
     group_id = groupname or group.id
     portal_groups = portal.get_tool('portal_groups')
     portal_groups.addPrincipalToGroup(user_id, group_id)
+    _invalidate_members()
 
 
 @mutually_exclusive_parameters('groupname', 'group')
@@ -200,6 +205,7 @@ def remove_user(groupname=None, group=None, username=None, user=None):
     group_id = groupname or group.id
     portal_groups = portal.get_tool('portal_groups')
     portal_groups.removePrincipalFromGroup(user_id, group_id)
+    _invalidate_members()
 
 
 @mutually_exclusive_parameters('groupname', 'group')
@@ -244,13 +250,7 @@ def get_roles(groupname=None, group=None, obj=None, inherit=True):
         plone_user = super(group.__class__, group)
         principal_ids = list(plone_user.getGroups())
         principal_ids.insert(0, plone_user.getId())
-        roles = set([])
-        pas = portal.get_tool('acl_users')
-        for _, lrmanager in pas.plugins.listPlugins(ILocalRolesPlugin):
-            for adapter in lrmanager._getAdapters(obj):
-                for principal_id in principal_ids:
-                    roles.update(adapter.getRoles(principal_id))
-        return list(roles)
+        return list(_get_local_roles(obj, principal_ids))
 
 
 @required_parameters('roles')
@@ -296,10 +296,42 @@ def grant_roles(groupname=None, group=None, roles=None, obj=None):
 
     if obj is None:
         portal_groups.setRolesForGroup(group_id=group_id, roles=roles)
+        _invalidate_members()
     else:
         obj.manage_setLocalRoles(group_id, roles)
 
 
+@required_parameters('objects', 'roles')
+@mutually_exclusive_parameters('groupname', 'group')
+@at_least_one_of('groupname', 'group')
+def grant_roles_many(groupname=None, group=None, objects=None, roles=None):
+    """Grant local roles to a group on many objects.
+
+    Arguments ``groupname`` and ``group`` are mutually exclusive. You can
+    either set one or the other, but not both.
+
+    Objects on which the group already has all of the roles are left alone.
+    Object security is reindexed once per topmost changed object.
+
+    :param groupname: Name of the group to grant roles to.
+    :type groupname: string
+    :param group: Group to grant roles to.
+    :type group: GroupData object
+    :param objects: [required] Objects to grant the roles on.
+    :type objects: List of content objects
+    :param roles: [required] List of roles to grant
+    :type roles: list of strings
+    :raises:
+        ValueError
+    :Example: :ref:`group_grant_roles_many_example`
+    """
+    if 'Anonymous' in roles or 'Authenticated' in roles:
+        raise ValueError
+
+    group_id = groupname or group.id
+    _grant_local_roles(group_id, objects, roles)
+
+
 @required_parameters('roles')
 @mutually_exclusive_parameters('groupname', 'group')
 @at_least_one_of('groupname', 'group')
@@ -342,6 +374,7 @@ def revoke_roles(groupname=None, group=None, roles=None, obj=None):
 
     if obj is None:
         portal_groups.setRolesForGroup(group_id=group_id, roles=roles)
+        _invalidate_members()
     elif roles:
         obj.manage_setLocalRoles(group_id, roles)
     else:
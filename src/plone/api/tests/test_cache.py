@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Tests for plone.api.cache."""
+
+from plone.api.cache import get_request_cache
+from plone.api.cache import get_transaction_cache
+from plone.api.cache import LRUCache
+from plone.api.tests.base import INTEGRATION_TESTING
+
+import mock
+import transaction
+import unittest
+
+
+class TestPloneAPICache(unittest.TestCase):
+    """Test plone.api.cache."""
+
+    layer = INTEGRATION_TESTING
+
+    def test_transaction_cache(self):
+        """Test that a transaction cache is shared within a transaction."""
+        cache = get_transaction_cache('test')
+        cache['foo'] = 'bar'
+        self.assertIs(get_transaction_cache('test'), cache)
+        self.assertNotIn('foo', get_transaction_cache('other'))
+
+    def test_transaction_cache_is_dropped(self):
+        """Test that the next transaction starts with an empty cache."""
+        get_transaction_cache('test')['foo'] = 'bar'
+        transaction.abort()
+        self.assertEqual(get_transaction_cache('test'), {})
+
+    def test_request_cache(self):
+        """Test that a request cache is stored on the request."""
+        request = self.layer['request']
+        cache = get_request_cache('test', request)
+        cache['foo'] = 'bar'
+        self.assertIs(get_request_cache('test', request), cache)
+        self.assertNotIn('foo', get_request_cache('other', request))
+
+    def test_request_cache_without_request(self):
+        """Test that nothing is cached without a request."""
+        with mock.patch('plone.api.cache.getRequest', return_value=None):
+            cache = get_request_cache('test')
+            cache['foo'] = 'bar'
+            self.assertEqual(get_request_cache('test'), {})
+
+
+class TestLRUCache(unittest.TestCase):
+    """Test plone.api.cache.LRUCache."""
+
+    def test_get_set(self):
+        """Test adding and getting entries."""
+        cache = LRUCache(maxsize=10)
+        self.assertIsNone(cache.get('foo'))
+        self.assertEqual(cache.get('foo', 'default'), 'default')
+        cache.set('foo', 'bar')
+        self.assertEqual(cache.get('foo'), 'bar')
+        self.assertIn('foo', cache)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.pop('foo'), 'bar')
+        self.assertNotIn('foo', cache)
+
+    def test_counters(self):
+        """Test that hits and misses are counted."""
+        cache = LRUCache()
+        cache.set('foo', 'bar')
+        cache.get('foo')
+        cache.get('foo')
+        cache.get('baz')
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.misses, 1)
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.hits, 0)
+        self.assertEqual(cache.misses, 0)
+
+    def test_least_recently_used_dropped(self):
+        """Test that the least recently used entries are dropped."""
+        cache = LRUCache(maxsize=3)
+        for key in 'abc':
+            cache.set(key, key)
+        cache.get('a')
+        cache.set('d', 'd')
+        self.assertEqual([key for key, value in cache.items()], list('cad'))
+
+        # Shrinking drops the oldest entries right away
+        cache.maxsize = 1
+        self.assertEqual(cache.items(), [('d', 'd')])
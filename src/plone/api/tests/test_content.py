@@ -2,13 +2,20 @@
 """Tests for plone.api.content."""
 
 from Acquisition import aq_base
+from DateTime import DateTime
 from OFS.CopySupport import CopyError
 from OFS.event import ObjectWillBeMovedEvent
 from OFS.interfaces import IObjectWillBeMovedEvent
 from plone import api
 from plone.api.content import NEW_LINKINTEGRITY
+from plone.api.tests.base import FUNCTIONAL_TESTING
 from plone.api.tests.base import INTEGRATION_TESTING
 from plone.app.linkintegrity.exceptions import LinkIntegrityNotificationException  # NOQA: E501
+from plone.app.testing import login
+from plone.app.testing import logout
+from plone.app.testing import setRoles
+from plone.app.testing import TEST_USER_ID
+from plone.app.testing import TEST_USER_NAME
 from plone.app.textfield import RichTextValue
 from plone.dexterity.interfaces import IDexterityContent
 from plone.indexer import indexer
@@ -19,8 +26,10 @@ from Products.CMFCore.WorkflowCore import WorkflowException
 from Products.ZCatalog.interfaces import IZCatalog
 from zExceptions import BadRequest
 from zope.component import getGlobalSiteManager
+from zope.component import getSiteManager
 from zope.component import getUtility
 from zope.container.contained import ContainerModifiedEvent
+from zope.interface import Interface
 from zope.lifecycleevent import IObjectModifiedEvent
 from zope.lifecycleevent import IObjectMovedEvent
 from zope.lifecycleevent import modified
@@ -28,6 +37,7 @@ from zope.lifecycleevent import ObjectMovedEvent
 
 import mock
 import pkg_resources
+import transaction
 import unittest
 
 
@@ -420,6 +430,112 @@ class TestPloneApiContent(unittest.TestCase):
         # Test getting a non-existing subfolder by path
         self.assertFalse(api.content.get('/about/spam'))
 
+    def test_get_uid_path_cache(self):
+        """Test that paths of UIDs are cached and invalidated."""
+        from plone.api.content import _uid_paths
+        _uid_paths.clear()
+        uid = api.content.get_uuid(self.team)
+
+        with mock.patch(
+            'plone.api.content.uuidToObject',
+            wraps=api.content.uuidToObject,
+        ) as uuid_to_object:
+            for i in range(3):
+                self.assertEqual(
+                    aq_base(api.content.get(UID=uid)),
+                    aq_base(self.team),
+                )
+            self.assertEqual(uuid_to_object.call_count, 1)
+            self.assertEqual(_uid_paths.misses, 1)
+            self.assertEqual(_uid_paths.hits, 2)
+
+            # Moving the parent invalidates the path
+            api.content.move(source=self.about, target=self.events)
+            team = api.content.get(UID=uid)
+            self.assertEqual(
+                team.getPhysicalPath(),
+                self.portal.getPhysicalPath() + ('events', 'about', 'team'),
+            )
+            self.assertEqual(uuid_to_object.call_count, 2)
+
+            # Deleting invalidates the path
+            api.content.delete(obj=self.events['about'])
+            self.assertIsNone(api.content.get(UID=uid))
+
+    def test_get_uid_path_cache_stale(self):
+        """Test that stale paths are not used once the catalog changed."""
+        from plone.api.content import _uid_paths
+        uid = api.content.get_uuid(self.team)
+        api.content.get(UID=uid)
+
+        # Replace the object behind the back of plone.api
+        self.about.manage_delObjects(['team'])
+        api.content.create(container=self.about, type='Document', id='team')
+        self.assertIsNone(api.content.get(UID=uid))
+        key = ('/'.join(self.portal.getPhysicalPath()), uid)
+        self.assertNotIn(key, _uid_paths)
+
+    def test_get_uid_path_cache_security(self):
+        """Test that a cached path does not reveal objects the current user
+        could not find in the catalog.
+        """
+        uid = api.content.get_uuid(self.team)
+        self.assertEqual(api.content.get_state(obj=self.team), 'private')
+        self.assertIsNotNone(api.content.get(UID=uid))
+
+        logout()
+        self.assertIsNone(api.content.get(UID=uid))
+
+    def test_get_uid_path_cache_expired(self):
+        """Test that a cached path does not reveal expired content to users
+        who may not access inactive content.
+        """
+        api.content.transition(obj=self.blog, transition='publish')
+        self.blog.setExpirationDate(DateTime() - 1)
+        self.blog.reindexObject()
+        uid = api.content.get_uuid(self.blog)
+        self.assertIsNotNone(api.content.get(UID=uid))
+
+        logout()
+        self.assertIsNone(api.content.get(UID=uid))
+
+    def test_uid_cache_size(self):
+        """Test resizing the UID cache and reading its counters."""
+        from plone.api.content import _uid_paths
+        from plone.api.exc import InvalidParameterError
+        from plone.api.exc import MissingParameterError
+        _uid_paths.clear()
+        self.addCleanup(api.content.set_uid_cache_size, size=1000)
+
+        with self.assertRaises(MissingParameterError):
+            api.content.set_uid_cache_size()
+        for size in (-1, 1.5, '10', True):
+            with self.assertRaises(InvalidParameterError):
+                api.content.set_uid_cache_size(size=size)
+
+        api.content.get(UID=api.content.get_uuid(self.team))
+        api.content.get(UID=api.content.get_uuid(self.contact))
+        self.assertEqual(
+            api.content.get_uid_cache_info(),
+            {'size': 2, 'maxsize': 1000, 'hits': 0, 'misses': 2},
+        )
+
+        # Shrinking drops the least recently used paths
+        api.content.set_uid_cache_size(size=1)
+        api.content.get(UID=api.content.get_uuid(self.contact))
+        self.assertEqual(
+            api.content.get_uid_cache_info(),
+            {'size': 1, 'maxsize': 1, 'hits': 1, 'misses': 2},
+        )
+
+        # No paths are kept at all
+        api.content.set_uid_cache_size(size=0)
+        self.assertEqual(
+            aq_base(api.content.get(UID=api.content.get_uuid(self.team))),
+            aq_base(self.team),
+        )
+        self.assertEqual(api.content.get_uid_cache_info()['size'], 0)
+
     def test_move_constraints(self):
         """Test the constraints for moving content."""
         from plone.api.exc import MissingParameterError
@@ -857,6 +973,116 @@ class TestPloneApiContent(unittest.TestCase):
         self.assertNotIn('blog', self.portal.keys())
         self.assertNotIn('training', self.portal['events'].keys())
 
+    def test_delete_bulk_unindex(self):
+        """Test that dropping catalog records by path prefix leaves
+        portal_catalog in the same state as a normal delete.
+        """
+        catalog = api.portal.get_tool('portal_catalog')
+        portal_path = '/'.join(self.portal.getPhysicalPath())
+        about_path = '/'.join(self.about.getPhysicalPath())
+
+        def catalog_state():
+            return sorted(
+                (brain.getPath(), brain.portal_type)
+                for brain in catalog.unrestrictedSearchResults(
+                    path=portal_path,
+                )
+            )
+
+        savepoint = transaction.savepoint()
+        api.content.delete(obj=self.about)
+        expected = catalog_state()
+        expected_length = len(catalog)
+        savepoint.rollback()
+
+        self.assertIn('about', self.portal.keys())
+        api.content.delete(
+            obj=self.about,
+            bulk_unindex=True,
+            check_linkintegrity=False,
+        )
+
+        self.assertNotIn('about', self.portal.keys())
+        self.assertEqual(catalog_state(), expected)
+        self.assertEqual(len(catalog), expected_length)
+        self.assertEqual(
+            len(catalog.unrestrictedSearchResults(path=about_path)),
+            0,
+        )
+
+    def test_delete_bulk_unindex_old_linkintegrity(self):
+        """Test that old linkintegrity, which checks in event subscribers,
+        can not be combined with the bulk mode.
+        """
+        from plone.api.exc import InvalidParameterError
+        with mock.patch('plone.api.content.NEW_LINKINTEGRITY', False):
+            with self.assertRaises(InvalidParameterError):
+                api.content.delete(obj=self.about, bulk_unindex=True)
+            self.assertIn('about', self.portal.keys())
+
+    def test_delete_bulk_unindex_no_events(self):
+        """Test that no events are fired for the deleted descendants."""
+        with mock.patch.object(
+            type(aq_base(self.team)),
+            'unindexObject',
+        ) as unindex:
+            api.content.delete(
+                obj=self.about,
+                bulk_unindex=True,
+                check_linkintegrity=False,
+            )
+        self.assertEqual(unindex.call_count, 0)
+        self.assertNotIn('about', self.portal.keys())
+
+    def test_delete_tree_constraints(self):
+        """Test the constraints for deleting a content tree."""
+        from plone.api.exc import InvalidParameterError
+        from plone.api.exc import MissingParameterError
+
+        with self.assertRaises(MissingParameterError):
+            api.content.delete_tree()
+
+        with self.assertRaises(InvalidParameterError):
+            api.content.delete_tree(obj=self.events, chunk_size=0)
+
+    @unittest.skipUnless(
+        NEW_LINKINTEGRITY,
+        'Only new Linkintegrity can be checked before deleting.',
+    )
+    def test_delete_tree_check_linkintegrity(self):
+        """Test deleting a tree with a link pointing into it."""
+        self._set_text(self.team, '<a href="../events/training">training</a>')
+        with self.assertRaises(LinkIntegrityNotificationException):
+            api.content.delete_tree(obj=self.events)
+        self.assertIn('training', self.portal['events'].keys())
+
+    def test_delete_tree_old_linkintegrity(self):
+        """Test that old linkintegrity, which checks in event subscribers,
+        can only be ignored when deleting a tree.
+        """
+        from plone.api.exc import InvalidParameterError
+        self._set_text(self.team, '<a href="../events/training">training</a>')
+        with mock.patch('plone.api.content.NEW_LINKINTEGRITY', False):
+            with self.assertRaises(InvalidParameterError):
+                api.content.delete_tree(obj=self.events)
+            self.assertIn('training', self.portal['events'].keys())
+
+            # Breaches reported by the subscribers do not stop the deletion
+            # halfway.
+            with mock.patch.object(
+                type(aq_base(self.events)),
+                'manage_delObjects',
+                autospec=True,
+                side_effect=LinkIntegrityNotificationException,
+            ) as manage_delObjects:
+                with mock.patch('transaction.commit'):
+                    api.content.delete_tree(
+                        obj=self.events,
+                        chunk_size=1,
+                        check_linkintegrity=False,
+                    )
+        self.assertGreater(manage_delObjects.call_count, 1)
+
     def _set_text(self, obj, text):
         if IDexterityContent.providedBy(obj):
             # Dexterity
@@ -1021,6 +1247,209 @@ class TestPloneApiContent(unittest.TestCase):
         review_state = api.content.get_state(obj=self.blog, default=default)
         review_state is not default
 
+    def test_get_state_memoized(self):
+        """Test that the workflow chain is resolved once per transaction."""
+        workflow = api.portal.get_tool('portal_workflow')
+        klass = aq_base(workflow).__class__
+        self.assertEqual(api.content.get_state(obj=self.blog), 'private')
+
+        with mock.patch.object(
+            klass,
+            'getChainFor',
+            autospec=True,
+            side_effect=klass.getChainFor,
+        ) as get_chain:
+            for i in range(10):
+                self.assertEqual(
+                    api.content.get_state(obj=self.blog),
+                    'private',
+                )
+        self.assertEqual(get_chain.call_count, 0)
+
+        # Transitions invalidate the memo.
+        api.content.transition(obj=self.blog, transition='publish')
+        self.assertEqual(api.content.get_state(obj=self.blog), 'published')
+
+        # Also when they bypass plone.api.
+        workflow.doActionFor(self.blog, 'retract')
+        self.assertEqual(api.content.get_state(obj=self.blog), 'private')
+
+    def test_get_state_memo_per_transaction(self):
+        """Test that the memo does not outlive the transaction."""
+        from plone.api.cache import get_transaction_cache
+        from plone.api.content import _STATE_CACHE
+
+        api.content.get_state(obj=self.blog)
+        self.assertTrue(get_transaction_cache(_STATE_CACHE))
+
+        transaction.abort()
+        self.assertFalse(get_transaction_cache(_STATE_CACHE))
+
+    def test_get_states(self):
+        """Test getting the workflow states of many objects."""
+        from plone.api.exc import MissingParameterError
+        with self.assertRaises(MissingParameterError):
+            api.content.get_states()
+
+        api.content.transition(obj=self.blog, transition='publish')
+        states = api.content.get_states(
+            objects=[self.blog, self.about, self.image],
+        )
+        self.assertEqual(
+            states,
+            {
+                api.content.get_uuid(self.blog): 'published',
+                api.content.get_uuid(self.about): 'private',
+                api.content.get_uuid(self.image): None,
+            },
+        )
+
+    def test_get_states_brains(self):
+        """Test that brains are not woken up to get their states."""
+        brains = api.content.find(portal_type='Event')
+        self.assertEqual(len(brains), 3)
+
+        with mock.patch.object(type(brains[0]), 'getObject') as get_object:
+            states = api.content.get_states(objects=brains)
+        self.assertEqual(get_object.call_count, 0)
+        self.assertEqual(
+            states,
+            {brain.UID: 'private' for brain in brains},
+        )
+
+    def test_get_states_without_uuid(self):
+        """Test that objects without a UUID are keyed by their path."""
+        portal_path = '/'.join(self.portal.getPhysicalPath())
+        states = api.content.get_states(objects=[self.portal, self.about])
+        self.assertEqual(
+            states,
+            {
+                portal_path: api.content.get_state(
+                    obj=self.portal,
+                    default=None,
+                ),
+                api.content.get_uuid(self.about): 'private',
+            },
+        )
+
+    def test_get_states_uncatalogued(self):
+        """Test that objects missing in the catalog are still handled."""
+        catalog = api.portal.get_tool('portal_catalog')
+        catalog.uncatalog_object('/'.join(self.blog.getPhysicalPath()))
+
+        states = api.content.get_states(objects=[self.blog])
+        self.assertEqual(
+            states,
+            {api.content.get_uuid(self.blog): 'private'},
+        )
+
+    def test_workflow_chain_cache(self):
+        """Test that chains are resolved once per portal_type."""
+        from plone.api.content import _chain_cache
+        _chain_cache.clear()
+        workflow = api.portal.get_tool('portal_workflow')
+        klass = aq_base(workflow).__class__
+        with mock.patch.object(
+            klass,
+            'getChainFor',
+            autospec=True,
+            side_effect=klass.getChainFor,
+        ) as get_chain:
+            for event in (self.training, self.conference, self.sprint):
+                self.assertEqual(api.content.get_state(obj=event), 'private')
+        self.assertEqual(get_chain.call_count, 1)
+
+    def _persistent_stub(self, **kwargs):
+        return mock.Mock(
+            _p_oid='oid',
+            _p_serial='1',
+            _p_changed=False,
+            **kwargs
+        )
+
+    def test_workflow_chain_cache_placeful_policy(self):
+        """Test that editing a placeful policy definition changes the key
+        chains are cached under.
+        """
+        from plone.api.content import _policy_definitions
+        chains = self._persistent_stub()
+        policy = self._persistent_stub(_chains_by_type=chains)
+        placeful_tool = mock.Mock()
+        placeful_tool.getWorkflowPolicyById.return_value = policy
+        site = mock.Mock(portal_placeful_workflow=placeful_tool)
+        config = mock.Mock()
+        config.getPolicyInId.return_value = 'intranet'
+        config.getPolicyBelowId.return_value = ''
+
+        key = _policy_definitions(site, config)
+        self.assertEqual(_policy_definitions(site, config), key)
+        placeful_tool.getWorkflowPolicyById.assert_called_with('intranet')
+
+        # The chains were committed by another connection
+        chains._p_serial = '2'
+        self.assertNotEqual(_policy_definitions(site, config), key)
+
+        # Uncommitted changes are never cached
+        chains._p_changed = True
+        self.assertIsNone(_policy_definitions(site, config))
+
+    def test_workflow_chain_cache_ghost(self):
+        """Test that ghosts are loaded before their serial is read."""
+        from plone.api.content import _persistent_token
+        ghost = self._persistent_stub()
+
+        def activate():
+            # Loading the state brings the serial of the current revision
+            ghost._p_serial = '2'
+
+        ghost._p_activate.side_effect = activate
+        self.assertEqual(_persistent_token(ghost), ('oid', '2'))
+
+    def test_workflow_chain_cache_invalidation(self):
+        """Test that chains are cached until the chains of the workflow tool
+        are committed again.
+        """
+        from plone.api.content import _chain_cache
+        from plone.api.content import _get_chain
+        workflow = api.portal.get_tool('portal_workflow')
+        chain = tuple(workflow.getChainFor(self.training))
+        serials = {'chains': '1'}
+
+        def persistent_token(ob):
+            # Pretend everything is committed, with the chains at the serial
+            # they were last committed with.
+            if ob is None:
+                return ()
+            if ob is aq_base(workflow)._chains_by_type:
+                return ('chains', serials['chains'])
+            return ('other', '1')
+
+        _chain_cache.clear()
+        with mock.patch(
+            'plone.api.content._persistent_token',
+            side_effect=persistent_token,
+        ):
+            self.assertEqual(_get_chain(self.training, workflow), chain)
+            entry = _chain_cache[workflow.getPhysicalPath()]
+
+            workflow.setChainForPortalTypes(
+                ('Event', ),
+                ('one_state_workflow', ),
+            )
+            # The same serial, the cached chain is still used
+            self.assertEqual(_get_chain(self.training, workflow), chain)
+            self.assertIs(_chain_cache[workflow.getPhysicalPath()], entry)
+
+            # The chains were committed
+            serials['chains'] = '2'
+            self.assertEqual(
+                _get_chain(self.training, workflow),
+                ('one_state_workflow', ),
+            )
+            new_entry = _chain_cache[workflow.getPhysicalPath()]
+            self.assertIsNot(new_entry, entry)
+            self.assertEqual(new_entry[0][1], ('chains', '2'))
+
     def test_transition(self):
         """Test transitioning the workflow state on a content item."""
         from plone.api.exc import InvalidParameterError
@@ -1091,6 +1520,195 @@ class TestPloneApiContent(unittest.TestCase):
             'internally_published',
         )
 
+    def test_transition_unreachable_state(self):
+        """Test that unreachable states fail without touching the object."""
+        from plone.api.exc import InvalidParameterError
+        workflow = api.portal.get_tool('portal_workflow')
+        klass = aq_base(workflow).__class__
+
+        with mock.patch.object(klass, 'doActionFor') as do_action:
+            with mock.patch.object(klass, 'getInfoFor') as get_info:
+                with self.assertRaises(InvalidParameterError):
+                    api.content.transition(obj=self.blog, to_state='foo')
+        self.assertEqual(do_action.call_count, 0)
+        self.assertEqual(get_info.call_count, 0)
+
+    def test_transition_plan_route(self):
+        """Test that routes are planned with the guards of the user."""
+        from plone.api.content import _plan_route
+        workflow = api.portal.get_tool('portal_workflow')
+        wf = workflow.getWorkflowsFor(self.blog)[0]
+
+        # A manager can publish right away.
+        self.assertEqual(
+            _plan_route(wf, self.blog, 'private', 'published'),
+            ('publish', ),
+        )
+
+        # An owner can only submit.
+        api.user.create(email='bob@plone.org', username='bob')
+        api.user.grant_roles(username='bob', obj=self.blog, roles=['Owner'])
+        with api.env.adopt_user(username='bob'):
+            self.assertEqual(
+                _plan_route(wf, self.blog, 'private', 'published'),
+                ('submit', 'publish'),
+            )
+            with api.env.adopt_roles(['Anonymous']):
+                self.assertIsNone(
+                    _plan_route(wf, self.blog, 'private', 'published'),
+                )
+
+    def test_transition_compute_routes_dense(self):
+        """Test that densely connected workflows are planned quickly."""
+        from plone.api.content import _compute_routes
+        from plone.api.content import _MAX_ROUTES
+        states = ['state{0}'.format(i) for i in range(12)]
+        graph = dict(
+            (state, [
+                ('to_' + new_state, new_state)
+                for new_state in states if new_state != state
+            ])
+            for state in states
+        )
+
+        # A state the workflow does not have is not searched for
+        self.assertEqual(_compute_routes(graph, 'state0', 'foo'), [])
+
+        routes = _compute_routes(graph, 'state0', 'state11')
+        self.assertEqual(len(routes), _MAX_ROUTES)
+        self.assertEqual(routes[0], ('to_state11', ))
+
+        # Without enough routes the search stops at the queue limit
+        graph['state11'] = []
+        for state in states[1:11]:
+            graph[state] = [
+                exit for exit in graph[state] if exit[1] != 'state11'
+            ]
+        self.assertEqual(
+            _compute_routes(graph, 'state0', 'state11'),
+            [('to_state11', )],
+        )
+
+    def test_transition_to_state_rolled_back(self):
+        """Test that a path which can not be completed is rolled back."""
+        from plone.api.exc import InvalidParameterError
+
+        api.user.create(email='bob@plone.org', username='bob')
+        api.user.grant_roles(username='bob', obj=self.blog, roles=['Owner'])
+        with api.env.adopt_user(username='bob'):
+            with self.assertRaises(InvalidParameterError):
+                api.content.transition(obj=self.blog, to_state='published')
+
+        # The submit step was undone.
+        self.assertEqual(api.content.get_state(obj=self.blog), 'private')
+
+    def test_transition_to_state_reindexes_once(self):
+        """Test that a path of transitions reindexes the object only once."""
+        portal_workflow = api.portal.get_tool('portal_workflow')
+        portal_workflow._chains_by_type['File'] = tuple(
+            ['intranet_workflow'],
+        )
+        test_file = api.content.create(
+            container=api.portal.get(),
+            type='File',
+            id='test-file',
+        )
+        api.content.transition(obj=test_file, transition='hide')
+
+        klass = aq_base(test_file).__class__
+        with mock.patch.object(klass, 'reindexObjectSecurity') as reindex:
+            api.content.transition(
+                obj=test_file,
+                to_state='internally_published',
+            )
+        self.assertEqual(reindex.call_count, 1)
+
+        # The catalog is up to date nevertheless.
+        catalog = api.portal.get_tool('portal_catalog')
+        brain = catalog(UID=api.content.get_uuid(test_file))[0]
+        self.assertEqual(brain.review_state, 'internally_published')
+
+    def _route_workflow(self, obj, side_effect):
+        """Mock a workflow running a single transition of a route."""
+        from Products.DCWorkflow.Transitions import TRIGGER_USER_ACTION
+        wf = mock.Mock()
+        wf.transitions.get.return_value.trigger_type = TRIGGER_USER_ACTION
+        wf.isActionSupported.return_value = True
+        wf.doActionFor.side_effect = side_effect
+        workflow = mock.Mock()
+        workflow.getStatusOf.side_effect = lambda wf_id, ob: {
+            'review_state': 'private' if ob is obj else 'published',
+        }
+        return workflow, wf
+
+    def test_transition_route_object_deleted(self):
+        """Test that an object deleted by a transition is not reindexed."""
+        from plone.api.content import _run_route
+        from Products.CMFCore.WorkflowCore import ObjectDeleted
+        workflow, wf = self._route_workflow(
+            self.blog,
+            ObjectDeleted('result'),
+        )
+        with mock.patch(
+            'plone.api.content._get_workflows_for',
+            return_value=[wf],
+        ):
+            _run_route(self.blog, workflow, wf, ['delete'], 'published')
+        wf.notifySuccess.assert_called_once_with(self.blog, 'delete', 'result')
+        self.assertFalse(workflow._reindexWorkflowVariables.called)
+
+    def test_transition_route_object_moved(self):
+        """Test that a route continues with the object a transition moved."""
+        from plone.api.content import _run_route
+        from Products.CMFCore.WorkflowCore import ObjectMoved
+        moved = self.about
+        workflow, wf = self._route_workflow(
+            self.blog,
+            ObjectMoved(moved, 'result'),
+        )
+        with mock.patch(
+            'plone.api.content._get_workflows_for',
+            return_value=[wf],
+        ):
+            _run_route(self.blog, workflow, wf, ['publish'], 'published')
+        wf.notifySuccess.assert_called_once_with(moved, 'publish', 'result')
+        workflow._reindexWorkflowVariables.assert_called_once_with(moved)
+
+    def test_transition_route_exception(self):
+        """Test that workflows are notified of a failing transition."""
+        from plone.api.content import _run_route
+        workflow, wf = self._route_workflow(self.blog, ValueError('broken'))
+        with mock.patch(
+            'plone.api.content._get_workflows_for',
+            return_value=[wf],
+        ):
+            with self.assertRaises(ValueError):
+                _run_route(self.blog, workflow, wf, ['publish'], 'published')
+        self.assertEqual(wf.notifyException.call_count, 1)
+        self.assertFalse(wf.notifySuccess.called)
+        self.assertFalse(workflow._reindexWorkflowVariables.called)
+
+    def test_get_reachable_states(self):
+        """Test getting the states reachable from a state."""
+        from plone.api.exc import MissingParameterError
+        with self.assertRaises(MissingParameterError):
+            api.content.get_reachable_states()
+
+        self.assertEqual(
+            api.content.get_reachable_states(obj=self.blog),
+            ['pending', 'published'],
+        )
+        self.assertEqual(
+            api.content.get_reachable_states(
+                obj=self.blog,
+                from_state='published',
+            ),
+            ['pending', 'private'],
+        )
+
+        # Images have no workflow
+        self.assertEqual(api.content.get_reachable_states(obj=self.image), [])
+
     def test_diable_roles_acquisition(self):
         """ Test disabling local roles acquisition.
         """
@@ -1119,6 +1737,71 @@ class TestPloneApiContent(unittest.TestCase):
         blog_ac_flag = getattr(self.blog, '__ac_local_roles_block__', None)
         self.assertFalse(blog_ac_flag)
 
+    def test_roles_acquisition_many(self):
+        """Test toggling the acquisition of local roles on many objects."""
+        from plone.api.exc import InvalidParameterError
+        with self.assertRaises(InvalidParameterError):
+            api.content.disable_roles_acquisition(
+                obj=self.about,
+                objects=[self.events],
+            )
+
+        sub = api.content.create(container=self.about, type='Folder', id='a')
+        subsub = api.content.create(container=sub, type='Folder', id='b')
+        other = api.content.create(
+            container=self.events,
+            type='Folder',
+            id='c',
+        )
+        folders = [subsub, self.events, sub, other, self.about]
+
+        klass = aq_base(self.about).__class__
+        with mock.patch.object(
+            klass,
+            'reindexObjectSecurity',
+            autospec=True,
+        ) as reindex:
+            api.content.disable_roles_acquisition(objects=folders)
+        for folder in folders:
+            self.assertTrue(folder.__ac_local_roles_block__)
+
+        # Security is reindexed once per topmost folder
+        self.assertEqual(
+            sorted(call[0][0].getId() for call in reindex.call_args_list),
+            ['about', 'events'],
+        )
+
+        # Objects which already have the flag are not reindexed
+        with mock.patch.object(
+            klass,
+            'reindexObjectSecurity',
+            autospec=True,
+        ) as reindex:
+            api.content.enable_roles_acquisition(objects=[sub, other])
+            api.content.enable_roles_acquisition(objects=[sub, other])
+        self.assertFalse(sub.__ac_local_roles_block__)
+        self.assertFalse(other.__ac_local_roles_block__)
+        self.assertTrue(subsub.__ac_local_roles_block__)
+        self.assertEqual(reindex.call_count, 2)
+
+    def test_roles_acquisition_many_unauthorized(self):
+        """Test that nothing changes when an object may not be modified."""
+        from AccessControl import Unauthorized
+        api.user.create(email='bob@plone.org', username='bob')
+        api.user.grant_roles(
+            username='bob',
+            obj=self.about,
+            roles=['Editor'],
+        )
+        with api.env.adopt_user(username='bob'):
+            with self.assertRaises(Unauthorized):
+                api.content.disable_roles_acquisition(
+                    objects=[self.about, self.events],
+                )
+        self.assertFalse(
+            getattr(self.about, '__ac_local_roles_block__', None),
+        )
+
     def test_get_view_constraints(self):
         """Test the constraints for deleting content."""
         from plone.api.exc import MissingParameterError
@@ -1172,6 +1855,123 @@ class TestPloneApiContent(unittest.TestCase):
         self.assertEqual(view.__name__, 'plone_context_state')
         self.assertEqual(aq_base(view.canonical_object()), aq_base(self.blog))
 
+    def test_get_view_cached(self):
+        """Test that cached views are reused within the request."""
+        request = self.layer['request']
+        view = api.content.get_view(
+            name='plone_context_state',
+            context=self.blog,
+            request=request,
+            cached=True,
+        )
+        self.assertIs(
+            api.content.get_view(
+                name='plone_context_state',
+                context=self.blog,
+                request=request,
+                cached=True,
+            ),
+            view,
+        )
+
+        # Uncached views are created anew
+        self.assertIsNot(
+            api.content.get_view(
+                name='plone_context_state',
+                context=self.blog,
+                request=request,
+            ),
+            view,
+        )
+
+        # Other names and contexts get other views
+        self.assertIsNot(
+            api.content.get_view(
+                name='plone',
+                context=self.blog,
+                request=request,
+                cached=True,
+            ),
+            view,
+        )
+        self.assertIsNot(
+            api.content.get_view(
+                name='plone_context_state',
+                context=self.about,
+                request=request,
+                cached=True,
+            ),
+            view,
+        )
+
+        # The same object acquired through another path is another context
+        acquired = self.about.blog
+        other = api.content.get_view(
+            name='plone_context_state',
+            context=acquired,
+            request=request,
+            cached=True,
+        )
+        self.assertIsNot(other, view)
+        self.assertIs(other.context, acquired)
+
+    def test_get_view_names_cached(self):
+        """Test that the available view names are only looked up on failure
+        and cached until the registry changes.
+        """
+        from plone.api.content import _view_names_cache
+        from plone.api.exc import InvalidParameterError
+        request = self.layer['request']
+        sm = getSiteManager()
+        _view_names_cache.clear()
+
+        with mock.patch.object(
+            sm.adapters,
+            'lookupAll',
+            wraps=sm.adapters.lookupAll,
+        ) as lookup_all:
+            api.content.get_view(
+                name='plone',
+                context=self.blog,
+                request=request,
+            )
+            self.assertEqual(lookup_all.call_count, 0)
+
+            for i in range(3):
+                with self.assertRaises(InvalidParameterError):
+                    api.content.get_view(
+                        name='foo',
+                        context=self.blog,
+                        request=request,
+                    )
+            self.assertEqual(lookup_all.call_count, 1)
+
+        # Registering a view invalidates the cache.
+        def factory(context, request):
+            return None
+
+        sm.registerAdapter(
+            factory,
+            (Interface, Interface),
+            Interface,
+            name='plone-api-test-view',
+        )
+        try:
+            with self.assertRaises(InvalidParameterError) as cm:
+                api.content.get_view(
+                    name='foo',
+                    context=self.blog,
+                    request=request,
+                )
+            self.assertIn('\nplone-api-test-view\n', str(cm.exception))
+        finally:
+            sm.unregisterAdapter(
+                factory,
+                (Interface, Interface),
+                Interface,
+                name='plone-api-test-view',
+            )
+
     def test_get_uuid(self):
         """Test getting a content item's UUID."""
         from plone.api.exc import MissingParameterError
@@ -1205,6 +2005,33 @@ class TestPloneApiContent(unittest.TestCase):
             self.assertEqual(uuid1, uuid2)
             self.assertIsInstance(uuid2, str)
 
+    def test_get_uuids(self):
+        """Test getting the UUIDs of objects and brains in order."""
+        from plone.api.exc import MissingParameterError
+        with self.assertRaises(MissingParameterError):
+            api.content.get_uuids()
+
+        objects = [self.sprint, self.blog, self.team]
+        uuids = [api.content.get_uuid(obj) for obj in objects]
+        self.assertEqual(api.content.get_uuids(objects=objects), uuids)
+
+        brains = api.content.find(UID=uuids[1])
+        self.assertEqual(
+            api.content.get_uuids(objects=[self.sprint, brains[0]]),
+            uuids[:2],
+        )
+        self.assertEqual(api.content.get_uuids(objects=[]), [])
+
+    def test_get_uuids_brains(self):
+        """Test that brains are not woken up to get their UUIDs."""
+        brains = api.content.find(portal_type='Event')
+        self.assertEqual(len(brains), 3)
+
+        with mock.patch.object(type(brains[0]), 'getObject') as get_object:
+            uuids = api.content.get_uuids(objects=brains)
+        self.assertEqual(get_object.call_count, 0)
+        self.assertEqual(uuids, [brain.UID for brain in brains])
+
     def test_get_view_view_not_found(self):
         """Test that error msg lists available views if a view is not found."""
         request = self.layer['request']
@@ -1248,3 +2075,156 @@ class TestPloneApiContent(unittest.TestCase):
 
         for should_be_there in should_be_theres:
             self.assertIn((should_be_there + '\n'), str(cm.exception))
+
+
+class TestPloneApiContentDeleteTree(unittest.TestCase):
+    """Tests for deleting content trees in committed chunks.
+
+    The functional layer stacks a fresh ZODB DemoStorage for every test, so
+    the chunks can really be committed.
+    """
+
+    layer = FUNCTIONAL_TESTING
+
+    def setUp(self):
+        """Create a tree of 1 + 3 + 15 content items.
+
+        Plone (portal root)
+        `-- tree
+            |-- folder-0
+            |   |-- doc-0
+            |   `-- ...
+            |-- folder-1
+            `-- folder-2
+        """
+        self.portal = self.layer['portal']
+        setRoles(self.portal, TEST_USER_ID, ['Manager'])
+        login(self.portal, TEST_USER_NAME)
+
+        self.tree = api.content.create(
+            container=self.portal,
+            type='Folder',
+            id='tree',
+        )
+        for i in range(3):
+            folder = api.content.create(
+                container=self.tree,
+                type='Folder',
+                id='folder-{0}'.format(i),
+            )
+            for j in range(5):
+                api.content.create(
+                    container=folder,
+                    type='Document',
+                    id='doc-{0}'.format(j),
+                )
+        self.path = '/'.join(self.tree.getPhysicalPath())
+
+    def test_delete_tree(self):
+        """Test deleting a tree in chunks, reporting progress."""
+        calls = []
+        api.content.delete_tree(
+            obj=self.tree,
+            chunk_size=5,
+            progress=lambda deleted, remaining: calls.append(
+                (deleted, remaining),
+            ),
+        )
+
+        self.assertEqual(calls, [(5, 14), (10, 9), (15, 4), (19, 0)])
+        self.assertNotIn('tree', self.portal)
+        catalog = api.portal.get_tool('portal_catalog')
+        self.assertEqual(
+            len(catalog.unrestrictedSearchResults(path=self.path)),
+            0,
+        )
+
+    def test_delete_tree_bottom_up(self):
+        """Test that containers are only deleted after their contents."""
+        folder_class = type(aq_base(self.tree))
+        manage_delObjects = folder_class.manage_delObjects
+        deletions = []
+
+        def record(container, ids, *args, **kwargs):
+            deletions.extend(
+                '{0}/{1}'.format(container.getId(), obj_id)
+                for obj_id in ids
+            )
+            return manage_delObjects(container, ids, *args, **kwargs)
+
+        with mock.patch.object(
+            folder_class,
+            'manage_delObjects',
+            autospec=True,
+            side_effect=record,
+        ):
+            api.content.delete_tree(obj=self.tree, chunk_size=15)
+
+        self.assertNotIn('tree', self.portal)
+        # The documents are deleted from their folders, the folders from
+        # the tree, the tree itself is deleted from the portal.
+        self.assertEqual(len(deletions), 18)
+        for i in range(3):
+            folder = 'folder-{0}'.format(i)
+            folder_deleted = deletions.index('tree/' + folder)
+            for j in range(5):
+                self.assertLess(
+                    deletions.index('{0}/doc-{1}'.format(folder, j)),
+                    folder_deleted,
+                )
+
+    def test_delete_tree_cache_gc(self):
+        """Test that the ZODB cache is garbage collected after every chunk.
+
+        The tree is too small to show that memory stays bounded on large
+        trees, this only checks that the cache is shrunk back to its target
+        size once a chunk is done.
+        """
+        connection = self.portal._p_jar
+        connection._cache.cache_size = 50
+
+        sizes = []
+        api.content.delete_tree(
+            obj=self.tree,
+            chunk_size=5,
+            progress=lambda deleted, remaining: sizes.append(
+                connection.cacheSize(),
+            ),
+        )
+
+        self.assertEqual(len(sizes), 4)
+        for size in sizes:
+            self.assertLessEqual(size, 50)
+
+    def test_delete_tree_resume(self):
+        """Test resuming an interrupted deletion."""
+        class Interrupted(Exception):
+            pass
+
+        def interrupt(deleted, remaining):
+            raise Interrupted
+
+        with self.assertRaises(Interrupted):
+            api.content.delete_tree(
+                obj=self.tree,
+                chunk_size=5,
+                progress=interrupt,
+            )
+
+        # The first chunk was committed, the rest is still there.
+        catalog = api.portal.get_tool('portal_catalog')
+        self.assertEqual(
+            len(catalog.unrestrictedSearchResults(path=self.path)),
+            14,
+        )
+
+        calls = []
+        api.content.delete_tree(
+            obj=self.portal['tree'],
+            chunk_size=5,
+            progress=lambda deleted, remaining: calls.append(
+                (deleted, remaining),
+            ),
+        )
+        self.assertEqual(calls, [(5, 9), (10, 4), (14, 0)])
+        self.assertNotIn('tree', self.portal)
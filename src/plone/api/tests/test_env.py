@@ -2,12 +2,14 @@
 """Tests for plone.api.roles."""
 
 from AccessControl import Unauthorized
+from AccessControl.SecurityManagement import getSecurityManager
 from OFS.SimpleItem import SimpleItem
 from plone import api
 from plone.api.tests.base import INTEGRATION_TESTING
 from plone.app.testing import TEST_USER_ID
 
 import AccessControl
+import threading
 import unittest
 
 
@@ -190,6 +192,78 @@ class TestPloneApiEnv(unittest.TestCase):
                 'private_method',
             ])
 
+    def test_adopt_roles_reusable(self):
+        """Test that an adopt_roles context manager can be reused."""
+        as_manager = api.env.adopt_roles(roles=['Manager'])
+        self.assertFalse(hasattr(as_manager, '__dict__'))
+        for i in range(3):
+            with as_manager:
+                self.should_allow(['rr_method'])
+            self.should_forbid(['rr_method'])
+
+        # It may even be entered again while it is active
+        with as_manager:
+            with api.env.adopt_roles(roles=['Anonymous']):
+                with as_manager:
+                    self.should_allow(['rr_method'])
+                self.should_forbid(['pp_method'])
+            self.should_allow(['rr_method'])
+        self.test_test_defaults()
+
+    def test_adopt_roles_threads(self):
+        """Test that an adopt_roles context manager shared between threads
+        only changes the roles of the thread entering or exiting it.
+        """
+        as_manager = api.env.adopt_roles(roles=['Manager'])
+        entered = threading.Event()
+        done = threading.Event()
+
+        def other_thread():
+            with as_manager:
+                entered.set()
+                done.wait(10)
+
+        thread = threading.Thread(target=other_thread)
+        with as_manager:
+            thread.start()
+            self.assertTrue(entered.wait(10))
+            self.should_allow(['rr_method'])
+        try:
+            self.should_forbid(['rr_method'])
+        finally:
+            done.set()
+            thread.join(10)
+        self.test_test_defaults()
+
+    def test_adopt_roles_enter_cost(self):
+        """Benchmark reusing an adopt_roles context manager in a loop
+        against creating a new one for every iteration.
+        """
+        import timeit
+
+        as_manager = api.env.adopt_roles(roles=['Manager'])
+
+        def reused():
+            with as_manager:
+                pass
+
+        def created():
+            with api.env.adopt_roles(roles=['Manager']):
+                pass
+
+        self.assertLess(
+            min(timeit.repeat(reused, number=2000, repeat=5)),
+            min(timeit.repeat(created, number=2000, repeat=5)),
+        )
+        self.test_test_defaults()
+
+    def test_adopt_roles_exception(self):
+        """Test that roles are restored when the block raises."""
+        with self.assertRaises(ExampleException):
+            with api.env.adopt_roles(roles=['Manager']):
+                raise ExampleException()
+        self.test_test_defaults()
+
     def test_content_owner_role(self):
         """Tests that adopting a role should not affect content ownership."""
         with api.env.adopt_roles(roles=['Manager']):
@@ -395,6 +469,99 @@ class TestPloneApiEnv(unittest.TestCase):
         with api.env.adopt_user(user=nobody):
             self.assertEqual(nobody, api.user.get_current())
 
+    def test_adopt_user_exception(self):
+        """Test that the security manager is restored when the block raises.
+        """
+        old = getSecurityManager()
+        with self.assertRaises(ExampleException):
+            with api.env.adopt_user(username='superhuman'):
+                raise ExampleException()
+        self.assertIs(getSecurityManager(), old)
+        self.test_test_defaults()
+
+    def test_adopt_user_threads(self):
+        """Test that an adopt_user context manager shared between threads
+        restores the security manager of the thread exiting it.
+        """
+        old = getSecurityManager()
+        as_superhuman = api.env.adopt_user(username='superhuman')
+        entered = threading.Event()
+        done = threading.Event()
+
+        def other_thread():
+            with as_superhuman:
+                entered.set()
+                done.wait(10)
+
+        thread = threading.Thread(target=other_thread)
+        with as_superhuman:
+            thread.start()
+            self.assertTrue(entered.wait(10))
+        try:
+            self.assertIs(getSecurityManager(), old)
+        finally:
+            done.set()
+            thread.join(10)
+        self.test_test_defaults()
+
+    def test_adopt_user_deep_nesting(self):
+        """Test that deeply nested adoptions unwind to the right state."""
+        old = getSecurityManager()
+        as_superhuman = api.env.adopt_user(username='superhuman')
+        as_worker = api.env.adopt_user(username='worker')
+
+        def nest(depth):
+            if not depth:
+                raise ExampleException()
+            with as_superhuman:
+                self.should_allow(['rr_method'])
+                with as_worker:
+                    self.should_forbid(['rr_method'])
+                    with api.env.adopt_roles(roles=['Manager']):
+                        self.should_allow(['rr_method'])
+                        nest(depth - 1)
+
+        with self.assertRaises(ExampleException):
+            nest(50)
+        self.assertIs(getSecurityManager(), old)
+        self.test_test_defaults()
+
+    def test_adopt_user_enter_cost(self):
+        """Benchmark entering and exiting adopt_user against the generator
+        based context manager it replaced.
+        """
+        from AccessControl.SecurityManagement import newSecurityManager
+        from AccessControl.SecurityManagement import setSecurityManager
+        from contextlib import contextmanager
+        from plone.api.env import _adopt_user
+        from plone.api.env import _get_wrapped_user
+        from zope.globalrequest import getRequest
+
+        import timeit
+
+        @contextmanager
+        def generator_adopt_user(user):
+            old_security_manager = getSecurityManager()
+            newSecurityManager(getRequest(), user)
+            try:
+                yield
+            finally:
+                setSecurityManager(old_security_manager)
+
+        user = _get_wrapped_user(username='superhuman')
+
+        def enter_exit(context_manager):
+            def run():
+                with context_manager(user):
+                    pass
+            return min(timeit.repeat(run, number=2000, repeat=5))
+
+        self.assertLess(
+            enter_exit(_adopt_user),
+            enter_exit(generator_adopt_user),
+        )
+        self.test_test_defaults()
+
     def test_empty_warning(self):
         """Tests that empty roles lists get warned about."""
         from plone.api.exc import InvalidParameterError
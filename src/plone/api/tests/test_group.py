@@ -363,6 +363,53 @@ class TestPloneApiGroup(unittest.TestCase):
         self.assertEqual(ROLES, set(api.group.get_roles(groupname='foo')))
         self.assertEqual(ROLES, set(api.group.get_roles(group=group)))
 
+    def test_grant_roles_many(self):
+        """Test granting local roles on many objects."""
+        from Acquisition import aq_base
+        group = api.group.create(groupname='foo')
+        portal = api.portal.get()
+        folder = api.content.create(container=portal, type='Folder', id='f1')
+        subfolder = api.content.create(
+            container=folder,
+            type='Folder',
+            id='f2',
+        )
+        other = api.content.create(container=portal, type='Folder', id='f3')
+
+        with self.assertRaises(ValueError):
+            api.group.grant_roles_many(
+                groupname='foo',
+                objects=[folder],
+                roles=['Authenticated'],
+            )
+
+        klass = aq_base(folder).__class__
+        with mock.patch.object(
+            klass,
+            'reindexObjectSecurity',
+            autospec=True,
+        ) as reindex:
+            api.group.grant_roles_many(
+                group=group,
+                objects=[subfolder, other, folder],
+                roles=['Reader'],
+            )
+            # Granting the same roles again changes nothing
+            api.group.grant_roles_many(
+                groupname='foo',
+                objects=[subfolder, other, folder],
+                roles=['Reader'],
+            )
+        for obj in (folder, subfolder, other):
+            self.assertEqual(
+                obj.get_local_roles_for_userid('foo'),
+                ('Reader', ),
+            )
+        self.assertEqual(
+            sorted(call[0][0].getId() for call in reindex.call_args_list),
+            ['f1', 'f3'],
+        )
+
     def test_revoke_roles(self):
         """Test revoke roles."""
         from plone.api.exc import InvalidParameterError
@@ -2,6 +2,7 @@
 """Tests for plone.api.user."""
 
 from AccessControl.Permission import getPermissions
+from AccessControl.SecurityManagement import getSecurityManager
 from borg.localrole.interfaces import ILocalRoleProvider
 from plone import api
 from plone.api.tests.base import INTEGRATION_TESTING
@@ -167,6 +168,132 @@ class TestPloneApiUser(unittest.TestCase):
             ['Authenticated'],
         )
 
+    def test_create_many(self):
+        """Test creating many users with configuration looked up once."""
+        from plone.api.exc import MissingParameterError
+        self._set_emaillogin(False)
+        records = [
+            {'username': 'chuck', 'email': 'chuck@norris.org'},
+            {'username': 'bruce'},
+            {
+                'username': 'bob',
+                'email': 'bob@plone.org',
+                'roles': ['Reviewer'],
+                'properties': {'fullname': 'Bob'},
+            },
+            {'username': 'chuck', 'email': 'chuck@norris.org'},
+        ]
+        progress = mock.Mock()
+
+        with mock.patch.object(
+            api.portal,
+            'get_registry_record',
+            wraps=api.portal.get_registry_record,
+        ) as get_registry_record:
+            created, errors = api.user.create_many(
+                records=records,
+                progress=progress,
+            )
+        self.assertEqual(get_registry_record.call_count, 1)
+
+        self.assertEqual(created, ['chuck', 'bob'])
+        self.assertEqual([index for index, error in errors], [1, 3])
+        self.assertIsInstance(errors[0][1], MissingParameterError)
+        self.assertIsInstance(errors[1][1], ValueError)
+        self.assertEqual(
+            [call[0][0] for call in progress.call_args_list],
+            [1, 2, 3, 4],
+        )
+
+        self.assertIsNone(api.user.get(username='bruce'))
+        bob = api.user.get(username='bob')
+        self.assertEqual(bob.getProperty('fullname'), 'Bob')
+        self.assertIn('Reviewer', api.user.get_roles(user=bob))
+        self.assertNotIn('username', records[2]['properties'])
+
+    def test_create_many_malformed(self):
+        """Test that malformed records are reported, not aborting the batch.
+        """
+        self._set_emaillogin(False)
+        records = [
+            {'username': 'chuck', 'email': 'chuck@norris.org', 'age': 77},
+            'bruce',
+            {'username': 'bob', 'email': 'bob@plone.org'},
+        ]
+        created, errors = api.user.create_many(records=records)
+        self.assertEqual(created, ['bob'])
+        self.assertEqual([index for index, error in errors], [0, 1])
+        for index, error in errors:
+            self.assertIsInstance(error, TypeError)
+        self.assertIsNone(api.user.get(username='chuck'))
+
+    def test_create_many_conflict(self):
+        """Test that conflict errors abort the batch, so it can be retried.
+        """
+        from ZODB.POSException import ConflictError
+        self._set_emaillogin(False)
+        registration = api.portal.get_tool('portal_registration')
+        with mock.patch.object(
+            registration,
+            'addMember',
+            side_effect=ConflictError,
+        ):
+            with self.assertRaises(ConflictError):
+                api.user.create_many(
+                    records=[{'username': 'bob', 'email': 'bob@plone.org'}],
+                )
+
+    def test_create_many_chunks(self):
+        """Test that the transaction is committed once per chunk."""
+        import transaction
+        self._set_emaillogin(False)
+        records = [
+            {'username': 'user{0}'.format(i), 'email': 'user@plone.org'}
+            for i in range(5)
+        ]
+        with mock.patch.object(transaction, 'commit') as commit:
+            created, errors = api.user.create_many(
+                records=records,
+                chunk_size=2,
+            )
+        self.assertEqual(len(created), 5)
+        self.assertEqual(errors, [])
+        # After the 2nd and 4th record, then for the rest
+        self.assertEqual(commit.call_count, 3)
+
+    def test_get_username_cached(self):
+        """Test that a login name is only searched for once per request."""
+        from plone.api import user as user_module
+        from plone.api.cache import get_request_cache
+        api.user.create(username='chuck', email='chuck@norris.org')
+        api.group.create(groupname='staff')
+
+        with mock.patch.object(
+            user_module,
+            'get_member_by_login_name',
+            wraps=user_module.get_member_by_login_name,
+        ) as get_member_by_login_name:
+            self.assertEqual(api.user.get(username='chuck').getId(), 'chuck')
+            api.group.add_user(groupname='staff', username='chuck')
+            self.assertIn(
+                'staff',
+                [group.id for group in api.group.get_groups(username='chuck')],
+            )
+            self.assertEqual(get_member_by_login_name.call_count, 1)
+
+            # The cached user id is verified before it is used
+            get_request_cache(user_module._USER_IDS_CACHE)['chuck'] = (
+                TEST_USER_ID
+            )
+            self.assertEqual(api.user.get(username='chuck').getId(), 'chuck')
+            self.assertEqual(get_member_by_login_name.call_count, 2)
+
+        # Deleting and creating users drops the cache
+        api.user.delete(username='chuck')
+        self.assertIsNone(api.user.get(username='chuck'))
+        api.user.create(username='chuck', email='chuck@norris.org')
+        self.assertEqual(api.user.get(username='chuck').getId(), 'chuck')
+
     def test_get_constraints(self):
         """Test that exception is raised if no username is given when getting
         the user.
@@ -239,6 +366,136 @@ class TestPloneApiUser(unittest.TestCase):
         with self.assertRaises(GroupNotFoundError):
             api.user.get_users(groupname='bacon')
 
+    def test_iter_users(self):
+        """Test iterating over all users in batches."""
+        for name in ('chuck', 'bruce', 'jackie'):
+            api.user.create(
+                username=name,
+                email='{0}@plone.org'.format(name),
+                properties={'fullname': name.title()},
+            )
+        usernames = ['chuck', 'bruce', 'jackie', TEST_USER_NAME]
+
+        users = api.user.iter_users(batch_size=2)
+        self.assertFalse(isinstance(users, list))
+        self.assertItemsEqual(
+            [user.getUserName() for user in users],
+            usernames,
+        )
+
+        self.assertItemsEqual(
+            api.user.iter_users(ids_only=True),
+            [user.getId() for user in api.user.get_users()],
+        )
+
+        with mock.patch.object(
+            self.portal.acl_users,
+            'getUserById',
+        ) as get_user_by_id:
+            items = list(api.user.iter_users(properties=['fullname']))
+        self.assertFalse(get_user_by_id.called)
+        self.assertIn({'id': 'bruce', 'fullname': 'Bruce'}, items)
+        self.assertEqual(len(items), 4)
+
+    def test_iter_users_constraints(self):
+        """Test that bad parameters are reported right away."""
+        from plone.api.exc import InvalidParameterError
+        with self.assertRaises(InvalidParameterError):
+            api.user.iter_users(ids_only=True, properties=['email'])
+        with self.assertRaises(InvalidParameterError):
+            api.user.iter_users(batch_size=0)
+
+    def test_search(self):
+        """Test searching users by their properties."""
+        api.user.create(
+            username='chuck',
+            email='chuck@norris.org',
+            properties={'fullname': 'Chuck Norris'},
+        )
+        api.user.create(
+            username='bruce',
+            email='bruce@lee.org',
+            properties={'fullname': 'Bruce Lee'},
+        )
+        api.user.create(
+            username='brandon',
+            email='brandon@lee.org',
+            properties={'fullname': 'Brandon Lee'},
+        )
+        api.group.create(groupname='staff')
+        api.group.add_user(username='brandon', groupname='staff')
+
+        def usernames(users):
+            return [user.getUserName() for user in users]
+
+        self.assertEqual(
+            usernames(api.user.search(email='norris')),
+            ['chuck'],
+        )
+        self.assertItemsEqual(
+            usernames(api.user.search(fullname='lee')),
+            ['bruce', 'brandon'],
+        )
+        self.assertEqual(
+            usernames(api.user.search(fullname='lee', email='bruce')),
+            ['bruce'],
+        )
+        self.assertEqual(
+            usernames(api.user.search(fullname='lee', groupname='staff')),
+            ['brandon'],
+        )
+        self.assertEqual(api.user.search(email='nobody'), [])
+
+    def test_search_group(self):
+        """Test that searching in a group does not enumerate all users."""
+        for name in ('chuck', 'bruce', 'brandon'):
+            api.user.create(
+                username=name,
+                email='{0}@plone.org'.format(name),
+                properties={'fullname': name.title()},
+            )
+            api.group.add_user(groupname='Reviewers', username=name)
+        api.user.create(username='bob', email='bob@plone.org')
+
+        acl_users = self.portal.acl_users
+        with mock.patch.object(acl_users, 'searchUsers') as search_users:
+            users = api.user.search(groupname='Reviewers', fullname='BR')
+            self.assertItemsEqual(
+                [user.getUserName() for user in users],
+                ['bruce', 'brandon'],
+            )
+            users = api.user.search(groupname='Reviewers', limit=2)
+            self.assertEqual(len(users), 2)
+        self.assertFalse(search_users.called)
+
+    def test_search_limit(self):
+        """Test that no more members are built than asked for."""
+        for name in ('chuck', 'bruce', 'brandon'):
+            api.user.create(
+                username=name,
+                email='{0}@plone.org'.format(name),
+            )
+        portal_membership = api.portal.get_tool('portal_membership')
+        with mock.patch.object(
+            portal_membership,
+            'getMemberById',
+            wraps=portal_membership.getMemberById,
+        ) as get_member_by_id:
+            users = api.user.search(email='plone.org', limit=2)
+        self.assertEqual(len(users), 2)
+        self.assertEqual(get_member_by_id.call_count, 2)
+
+        self.assertEqual(len(api.user.search(limit=2)), 2)
+
+    def test_search_constraints(self):
+        """Test searching for users with bad parameters."""
+        from plone.api.exc import GroupNotFoundError
+        from plone.api.exc import InvalidParameterError
+        with self.assertRaises(GroupNotFoundError):
+            api.user.search(groupname='bacon')
+        with self.assertRaises(InvalidParameterError):
+            api.user.search(limit=0)
+
     def test_delete_no_username(self):
         """Test deleting of a member with email login."""
 
@@ -316,6 +573,40 @@ class TestPloneApiUser(unittest.TestCase):
             api.user.get_roles(user=user),
         )
 
+    def test_get_roles_member_cached(self):
+        """Test that repeated role queries look the user up only once."""
+        user = api.user.create(
+            username='chuck',
+            email='chuck@norris.org',
+            password='secret',
+            roles=['Reviewer'],
+        )
+        with mock.patch.object(
+            self.portal_membership,
+            'getMemberById',
+            wraps=self.portal_membership.getMemberById,
+        ) as get_member:
+            for i in range(5):
+                self.assertItemsEqual(
+                    ['Reviewer', 'Authenticated'],
+                    api.user.get_roles(username='chuck'),
+                )
+                api.user.get_roles(user=user)
+            self.assertEqual(get_member.call_count, 1)
+
+            # Changing the roles drops the cached member
+            api.user.grant_roles(username='chuck', roles=['Editor'])
+            get_member.reset_mock()
+            self.assertItemsEqual(
+                ['Reviewer', 'Editor', 'Authenticated'],
+                api.user.get_roles(user=user),
+            )
+            self.assertItemsEqual(
+                ['Reviewer', 'Editor', 'Authenticated'],
+                api.user.get_roles(username='chuck'),
+            )
+            self.assertEqual(get_member.call_count, 1)
+
     def test_get_roles_username_and_user(self):
         """Test get roles passing username and user."""
         ROLES = ['Reviewer', 'Editor']
@@ -519,6 +810,85 @@ class TestPloneApiUser(unittest.TestCase):
         with self.assertRaises(UserNotFoundError):
             api.user.get_permissions(username='ming')
 
+    def test_get_permissions_filtered(self):
+        """Test getting only some permissions."""
+        api.user.create(
+            username='chuck',
+            email='chuck@norris.org',
+            password='secret',
+            roles=[],
+        )
+        self.assertEqual(
+            api.user.get_permissions(
+                username='chuck',
+                permissions=['View', 'Manage portal'],
+            ),
+            {'View': True, 'Manage portal': False},
+        )
+        self.assertEqual(
+            api.user.get_permissions(permissions=['Manage portal']),
+            {'Manage portal': True},
+        )
+
+    def test_get_permissions_lazy(self):
+        """Test that lazy permissions are only checked on access."""
+        api.user.create(
+            username='chuck',
+            email='chuck@norris.org',
+            password='secret',
+            roles=[],
+        )
+        with mock.patch(
+            'plone.api.user.rolesForPermissionOn',
+            wraps=api.user.rolesForPermissionOn,
+        ) as roles_for_permission:
+            permissions = api.user.get_permissions(username='chuck', lazy=True)
+            self.assertEqual(roles_for_permission.call_count, 0)
+            self.assertTrue(permissions['View'])
+            self.assertTrue(permissions['View'])
+            self.assertFalse(permissions.get('Manage portal'))
+            self.assertEqual(roles_for_permission.call_count, 2)
+
+        self.assertIn('View', permissions)
+        self.assertNotIn('Foo', permissions)
+        self.assertEqual(len(permissions), len(getPermissions()))
+
+    def test_get_permissions_roles_in_context(self):
+        """Test that permissions of a user are computed from the roles in
+        context, with the same result as the security policy.
+        """
+        user = api.user.create(
+            username='chuck',
+            email='chuck@norris.org',
+            password='secret',
+            roles=['Member'],
+        )
+        folder = api.content.create(
+            container=self.portal,
+            type='Folder',
+            id='folder_one',
+        )
+        api.user.grant_roles(user=user, obj=folder, roles=['Editor'])
+
+        with api.env.adopt_user(username='chuck'):
+            sm = getSecurityManager()
+            expected = {
+                record[0]: bool(sm.checkPermission(record[0], folder))
+                for record in getPermissions()
+            }
+
+        acl_user = api.env._get_wrapped_user(username='chuck')
+        with mock.patch.object(
+            acl_user.__class__,
+            'getRolesInContext',
+            autospec=True,
+            side_effect=acl_user.__class__.getRolesInContext,
+        ) as get_roles:
+            permissions = api.user.get_permissions(user=user, obj=folder)
+        self.assertEqual(get_roles.call_count, 1)
+        self.assertEqual(permissions, expected)
+        self.assertTrue(permissions['Modify portal content'])
+
     def test_get_permissions_context(self):
         """Test get permissions on some context."""
 
@@ -566,6 +936,58 @@ class TestPloneApiUser(unittest.TestCase):
                 ).get(k, None),
             )
 
+    def test_permission_matrix(self):
+        """Test checking a permission for many users on many objects."""
+        from plone.api.exc import UserNotFoundError
+        users = [
+            api.user.create(
+                username=username,
+                email='{0}@plone.org'.format(username),
+            )
+            for username in ('billy', 'bob', 'joe')
+        ]
+        folders = [
+            api.content.create(
+                container=self.portal,
+                type='Folder',
+                id='folder_{0}'.format(index),
+            )
+            for index in range(4)
+        ]
+        api.user.grant_roles(username='bob', obj=folders[1], roles=['Editor'])
+        api.user.grant_roles(username='joe', obj=folders[3], roles=['Editor'])
+        api.user.grant_roles(username='joe', roles=['Site Administrator'])
+
+        with mock.patch(
+            'plone.api.user.rolesForPermissionOn',
+            wraps=api.user.rolesForPermissionOn,
+        ) as roles_for_permission:
+            matrix = api.user.permission_matrix(
+                permission='Modify portal content',
+                users=[users[0], 'bob', users[2]],
+                objects=folders,
+            )
+        self.assertEqual(roles_for_permission.call_count, len(folders))
+        self.assertEqual(matrix, [0, 0b0010, 0b1111])
+
+        for user, bits in zip(users, matrix):
+            for index, folder in enumerate(folders):
+                self.assertEqual(
+                    bool(bits & (1 << index)),
+                    api.user.has_permission(
+                        'Modify portal content',
+                        user=user,
+                        obj=folder,
+                    ),
+                )
+
+        with self.assertRaises(UserNotFoundError):
+            api.user.permission_matrix(
+                permission='View',
+                users=['nobody-here'],
+                objects=folders,
+            )
+
     def test_has_permission_context(self):
         """Test has_permission on some context."""
 
@@ -701,6 +1123,59 @@ class TestPloneApiUser(unittest.TestCase):
                 roles=['Manager'],
             )
 
+    def test_grant_roles_many(self):
+        """Test granting local roles on many objects."""
+        from Acquisition import aq_base
+        from plone.api.exc import InvalidParameterError
+        from plone.api.exc import MissingParameterError
+        api.user.create(
+            username='chuck',
+            email='chuck@norris.org',
+            password='secret',
+        )
+        portal = api.portal.get()
+        folder = api.content.create(container=portal, type='Folder', id='f1')
+        subfolder = api.content.create(
+            container=folder,
+            type='Folder',
+            id='f2',
+        )
+        other = api.content.create(container=portal, type='Folder', id='f3')
+        api.user.grant_roles(username='chuck', roles=['Editor'], obj=other)
+
+        with self.assertRaises(MissingParameterError):
+            api.user.grant_roles_many(objects=[folder], roles=['Editor'])
+
+        with self.assertRaises(InvalidParameterError):
+            api.user.grant_roles_many(
+                username='chuck',
+                objects=[folder],
+                roles=['Anonymous'],
+            )
+
+        klass = aq_base(folder).__class__
+        with mock.patch.object(
+            klass,
+            'reindexObjectSecurity',
+            autospec=True,
+        ) as reindex:
+            api.user.grant_roles_many(
+                username='chuck',
+                objects=[subfolder, other, folder],
+                roles=['Editor'],
+            )
+        for obj in (folder, subfolder, other):
+            self.assertEqual(
+                obj.get_local_roles_for_userid('chuck'),
+                ('Editor', ),
+            )
+
+        # f3 already had the role and f2 is covered by f1
+        self.assertEqual(
+            [call[0][0].getId() for call in reindex.call_args_list],
+            ['f1'],
+        )
+
     def test_revoke_roles(self):
         """Test revoke roles."""
 
@@ -1033,6 +1508,58 @@ class TestPloneApiUser(unittest.TestCase):
             factory=LocalRoleProvider, provided=ILocalRoleProvider,
         )
 
+    def test_local_roles_adapters_looked_up_once(self):
+        """Test that local role adapters of an object are looked up once
+        for many users.
+        """
+        from Products.PlonePAS.interfaces.plugins import ILocalRolesPlugin
+        portal = api.portal.get()
+        folder = api.content.create(
+            container=portal,
+            type='Folder',
+            id='folder_one',
+        )
+        usernames = ['user{0}'.format(index) for index in range(10)]
+        for username in usernames:
+            api.user.create(
+                username=username,
+                email='{0}@plone.org'.format(username),
+            )
+        api.user.grant_roles(username='user3', obj=folder, roles=['Editor'])
+
+        plugins = [
+            lrmanager
+            for _, lrmanager in portal.acl_users.plugins.listPlugins(
+                ILocalRolesPlugin,
+            )
+        ]
+        patchers = [
+            mock.patch.object(
+                lrmanager,
+                '_getAdapters',
+                wraps=lrmanager._getAdapters,
+            )
+            for lrmanager in plugins
+        ]
+        get_adapters = [patcher.start() for patcher in patchers]
+        try:
+            roles = {
+                username: api.user.get_roles(
+                    username=username,
+                    obj=folder,
+                    inherit=False,
+                )
+                for username in usernames
+            }
+        finally:
+            for patcher in patchers:
+                patcher.stop()
+
+        self.assertEqual(roles['user3'], ['Editor'])
+        self.assertEqual(roles['user4'], [])
+        for mocked in get_adapters:
+            self.assertEqual(mocked.call_count, 1)
+
     def test_revoke_roles_in_context(self):
         """Test revoke roles."""
 
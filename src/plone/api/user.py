@@ -2,10 +2,16 @@
 """Module that provides functionality for user manipulation."""
 
 from AccessControl.Permission import getPermissions
+from AccessControl.PermissionRole import rolesForPermissionOn
 from AccessControl.SecurityManagement import getSecurityManager
+from Acquisition import aq_base
+from Acquisition import aq_chain
+from collections import Mapping
 from contextlib import contextmanager
 from plone.api import env
 from plone.api import portal
+from plone.api.cache import get_request_cache
+from plone.api.content import _reindex_security
 from plone.api.exc import GroupNotFoundError
 from plone.api.exc import InvalidParameterError
 from plone.api.exc import MissingParameterError
@@ -14,10 +20,21 @@ from plone.api.validation import at_least_one_of
 from plone.api.validation import mutually_exclusive_parameters
 from plone.api.validation import required_parameters
 from Products.CMFPlone.RegistrationTool import get_member_by_login_name
+from Products.CMFPlone.utils import safe_unicode
 from Products.PlonePAS.interfaces.plugins import ILocalRolesPlugin
+from ZODB.POSException import ConflictError
+from zope.component import getSiteManager
 
 import random
 import string
+import transaction
+
+
+_LOCAL_ROLES_CACHE = 'plone.api.user.local_roles'
+_MEMBERS_CACHE = 'plone.api.user.members'
+_USER_IDS_CACHE = 'plone.api.user.user_ids'
+_USER_IDS_CACHE_SIZE = 1000
+_PASSWORD_CHARS = string.ascii_letters + string.digits
 
 
 def create(
@@ -47,9 +64,103 @@ def create(
         InvalidParameterError
     :Example: :ref:`user_create_example`
     """
-    if properties is None:
-        # Never use a dict as default for a keyword argument.
-        properties = {}
+    registration = portal.get_tool('portal_registration')
+    user_id = _add_member(
+        registration,
+        _use_email_as_login(),
+        email=email,
+        username=username,
+        password=password,
+        roles=roles,
+        properties=properties,
+    )
+    _invalidate_members()
+    _invalidate_user_ids()
+    return get(username=user_id)
+
+
+@required_parameters('records')
+def create_many(records=None, chunk_size=None, progress=None):
+    """Create many users at once.
+
+    Site configuration is looked up once for the whole batch. Every record
+    is added in its own savepoint, so a record that fails is rolled back
+    and reported without aborting the batch.
+
+    :param records: [required] Iterable of dictionaries, each holding the
+        keyword arguments of :meth:`api.user.create` for one user.
+    :type records: iterable
+    :param chunk_size: Commit the transaction after this many records. If it
+        is not set, committing is left to the caller.
+    :type chunk_size: int
+    :param progress: Callable which is called with the number of records
+        processed so far after every record.
+    :type progress: callable
+    :returns: List of the ids of the created users and list of
+        ``(index, exception)`` tuples for the records that failed
+    :rtype: tuple
+    :raises:
+        MissingParameterError
+    :Example: :ref:`user_create_many_example`
+    """
+    registration = portal.get_tool('portal_registration')
+    use_email_as_username = _use_email_as_login()
+    created = []
+    errors = []
+
+    try:
+        for index, record in enumerate(records):
+            savepoint = transaction.savepoint()
+            try:
+                created.append(
+                    _add_member(
+                        registration,
+                        use_email_as_username,
+                        **record
+                    ),
+                )
+            except ConflictError:
+                # Let the transaction be retried instead of reporting every
+                # record after the conflict as failed.
+                raise
+            except Exception as e:
+                savepoint.rollback()
+                errors.append((index, e))
+
+            if chunk_size and not (index + 1) % chunk_size:
+                transaction.commit()
+            if progress is not None:
+                progress(index + 1)
+    finally:
+        _invalidate_members()
+        _invalidate_user_ids()
+
+    if chunk_size:
+        transaction.commit()
+    return created, errors
+
+
+def _use_email_as_login():
+    try:
+        return portal.get_registry_record('plone.use_email_as_login')
+    except InvalidParameterError:
+        site = portal.get()
+        props = site.portal_properties
+        return props.site_properties.use_email_as_login
+
+
+def _add_member(
+    registration,
+    use_email_as_username,
+    email=None,
+    username=None,
+    password=None,
+    roles=('Member', ),
+    properties=None,
+):
+    """Add a member through portal_registration and return its id."""
+    # Never change the properties dict we were given.
+    properties = dict(properties or {})
 
     # it may happen that someone passes email in the properties dict, catch
     # that and set the email so the code below this works fine
@@ -59,28 +170,17 @@ def create(
     if not email:
         raise MissingParameterError("You need to pass the new user's email.")
 
-    try:
-        use_email_as_username = portal.get_registry_record(
-            'plone.use_email_as_login',
-        )
-    except InvalidParameterError:
-        site = portal.get()
-        props = site.portal_properties
-        use_email_as_username = props.site_properties.use_email_as_login
-
     if not use_email_as_username and not username:
         raise InvalidParameterError(
             'The portal is configured to use username '
             'that is not email so you need to pass a username.',
         )
 
-    registration = portal.get_tool('portal_registration')
     user_id = use_email_as_username and email or username
 
     # Generate a random 8-char password
     if not password:
-        chars = string.ascii_letters + string.digits
-        password = ''.join(random.choice(chars) for char in range(8))
+        password = ''.join(random.choice(_PASSWORD_CHARS) for char in range(8))
 
     properties.update(username=user_id)
     properties.update(email=email)
@@ -91,7 +191,7 @@ def create(
         roles,
         properties=properties,
     )
-    return get(username=user_id)
+    return user_id
 
 
 @mutually_exclusive_parameters('userid', 'username')
@@ -123,11 +223,33 @@ def get(userid=None, username=None):
         portal_membership = portal.get_tool('portal_membership')
         return portal_membership.getMemberById(userid)
 
-    return get_member_by_login_name(
+    # Searching PAS for the login is what makes this expensive, so remember
+    # which user id the login belongs to for the rest of the request.
+    user_ids = get_request_cache(_USER_IDS_CACHE)
+    user_id = user_ids.get(username)
+    if user_id is not None:
+        portal_membership = portal.get_tool('portal_membership')
+        member = portal_membership.getMemberById(user_id)
+        # The login of a user may have changed behind our back
+        if member is not None and member.getUserName() == username:
+            return member
+        del user_ids[username]
+
+    member = get_member_by_login_name(
         portal.get(),
         username,
         raise_exceptions=False,
     )
+    if member is not None:
+        if len(user_ids) >= _USER_IDS_CACHE_SIZE:
+            user_ids.clear()
+        user_ids[username] = member.getId()
+    return member
+
+
+def _invalidate_user_ids():
+    """Drop the login names resolved for the current request."""
+    get_request_cache(_USER_IDS_CACHE).clear()
 
 
 def get_current():
@@ -173,6 +295,198 @@ def get_users(groupname=None, group=None):
         return portal_membership.listMembers()
 
 
+def iter_users(batch_size=100, properties=None, ids_only=False):
+    """Iterate over all users of the portal.
+
+    Unlike :meth:`api.user.get_users`, users are enumerated through PAS and
+    member objects are built one batch at a time, so the whole user base is
+    never held in memory at once.
+
+    :param batch_size: Number of users to build before the ones already
+        yielded are released again.
+    :type batch_size: int
+    :param properties: Names of the user properties to return. If set,
+        a dictionary with the user id under ``id`` and these properties is
+        yielded for every user instead of the member object.
+    :type properties: list
+    :param ids_only: If set, only yield user ids, without building any
+        user object.
+    :type ids_only: bool
+    :returns: Iterator over the users
+    :rtype: Iterator of MemberData objects, dictionaries or strings
+    :raises:
+        InvalidParameterError
+    :Example: :ref:`user_iter_users_example`
+    """
+    if ids_only and properties is not None:
+        raise InvalidParameterError(
+            'You can not get properties of users when only ids are '
+            'requested.',
+        )
+    if batch_size < 1:
+        raise InvalidParameterError('The batch size must be positive.')
+
+    # Not a generator function itself, so that bad parameters are reported
+    # when called and not only when iterated.
+    return _iter_users(batch_size, properties, ids_only)
+
+
+def _iter_users(batch_size, properties, ids_only):
+    acl_users = portal.get_tool('acl_users')
+    seen = set()
+    batch = []
+    for info in acl_users.searchUsers():
+        # Users found by more than one enumeration plugin come up once per
+        # plugin.
+        user_id = info['userid']
+        if user_id in seen:
+            continue
+        seen.add(user_id)
+
+        if ids_only:
+            yield user_id
+            continue
+
+        batch.append((user_id, info.get('login') or user_id))
+        if len(batch) >= batch_size:
+            for item in _build_users(acl_users, batch, properties):
+                yield item
+            batch = []
+
+    for item in _build_users(acl_users, batch, properties):
+        yield item
+
+
+def _build_users(acl_users, batch, properties):
+    """Build the users of a batch and release them once consumed."""
+    portal_membership = portal.get_tool('portal_membership')
+    for user_id, login in batch:
+        # We already know the login, spare PAS enumerating the user again
+        user = acl_users._findUser(acl_users.plugins, user_id, login)
+        if user is None:
+            continue
+        member = portal_membership.wrapUser(user)
+        if properties is None:
+            yield member
+        else:
+            item = {'id': user_id}
+            for name in properties:
+                item[name] = member.getProperty(name, None)
+            yield item
+
+    jar = getattr(acl_users, '_p_jar', None)
+    if jar is not None:
+        jar.cacheGC()
+
+
+@mutually_exclusive_parameters('groupname', 'group')
+def search(
+    email=None,
+    fullname=None,
+    groupname=None,
+    group=None,
+    limit=None,
+):
+    """Search for users by their properties.
+
+    The search is done by the PAS user enumeration plugins. If a group is
+    given, only the members of the group are looked at instead. Properties
+    match if they contain the given value, ignoring case. Member objects are
+    only built for the users that are returned, or for the members of the
+    group.
+
+    Arguments ``group`` and ``groupname`` are mutually exclusive.
+    You can either set one or the other, but not both.
+
+    :param email: Part of the email of the users to find.
+    :type email: string
+    :param fullname: Part of the full name of the users to find.
+    :type fullname: string
+    :param groupname: Groupname of the group of which to return users. If set,
+        only return users that are member of this group.
+    :type groupname: string
+    :param group: Group of which to return users.
+        If set, only return users that are member of this group.
+    :type group: GroupData object
+    :param limit: Maximum number of users to return.
+    :type limit: int
+    :returns: Users matching all given criteria
+    :rtype: List of MemberData objects
+    :raises:
+        GroupNotFoundError
+        InvalidParameterError
+    :Example: :ref:`user_search_example`
+    """
+    if limit is not None and limit < 1:
+        raise InvalidParameterError('The limit must be positive.')
+
+    criteria = {}
+    if email:
+        criteria['email'] = email
+    if fullname:
+        criteria['fullname'] = fullname
+
+    if groupname:
+        group_tool = portal.get_tool('portal_groups')
+        group = group_tool.getGroupById(groupname)
+        if not group:
+            raise GroupNotFoundError
+    if group:
+        # The group is usually much smaller than the user base, so go
+        # through its members instead of enumerating all users.
+        group_tool = portal.get_tool('portal_groups')
+        user_ids = sorted(group_tool.getGroupMembers(group.getId()))
+        return _search_members(user_ids, criteria, limit)
+
+    if limit and criteria:
+        # PAS may only cut the results short if we do not filter them any
+        # further. Without criteria, every user is reported by more than one
+        # plugin and the cut would leave us with less than the limit.
+        criteria['max_results'] = limit
+
+    acl_users = portal.get_tool('acl_users')
+    users = []
+    seen = set()
+    for info in acl_users.searchUsers(**criteria):
+        user_id = info['userid']
+        if user_id in seen:
+            continue
+        seen.add(user_id)
+
+        member = _get_member(user_id)
+        if member is None:
+            continue
+        users.append(member)
+        if limit and len(users) >= limit:
+            break
+    return users
+
+
+def _search_members(user_ids, criteria, limit):
+    """Get the members among user_ids whose properties match the criteria
+    like they do in PAS searches: containing the value, ignoring case.
+    """
+    criteria = [
+        (name, safe_unicode(value).lower())
+        for name, value in criteria.items()
+    ]
+    users = []
+    for user_id in user_ids:
+        # Groups may contain groups, which are no members
+        member = _get_member(user_id)
+        if member is None:
+            continue
+        for name, value in criteria:
+            prop = member.getProperty(name, None)
+            if not prop or value not in safe_unicode(prop).lower():
+                break
+        else:
+            users.append(member)
+            if limit and len(users) >= limit:
+                break
+    return users
+
+
 @mutually_exclusive_parameters('username', 'user')
 @at_least_one_of('username', 'user')
 def delete(username=None, user=None):
@@ -193,6 +507,8 @@ def delete(username=None, user=None):
     portal_membership = portal.get_tool('portal_membership')
     user_id = username or user.id
     portal_membership.deleteMembers((user_id,))
+    _invalidate_members()
+    _invalidate_user_ids()
 
 
 def is_anonymous():
@@ -227,18 +543,16 @@ def get_roles(username=None, user=None, obj=None, inherit=True):
         MissingParameterError
     :Example: :ref:`user_get_roles_example`
     """
-    portal_membership = portal.get_tool('portal_membership')
-
     if username is None:
         if user is None:
-            username = portal_membership.getAuthenticatedMember().getId()
-        else:
-            username = user.getId()
+            portal_membership = portal.get_tool('portal_membership')
+            user = portal_membership.getAuthenticatedMember()
+        username = user.getId()
 
-    if username is None and user is None:
-        user = portal_membership.getAuthenticatedMember()
-    else:
-        user = portal_membership.getMemberById(username)
+    # The member is fetched again, as the passed one may carry outdated
+    # roles, but only once per request. Anonymous has no id.
+    if username is not None:
+        user = _get_member(username)
 
     if user is None:
         raise UserNotFoundError
@@ -252,17 +566,63 @@ def get_roles(username=None, user=None, obj=None, inherit=True):
             plone_user = user.getUser()
             principal_ids = list(plone_user.getGroups())
             principal_ids.insert(0, plone_user.getId())
-            roles = set()
-            pas = portal.get_tool('acl_users')
-            for _, lrmanager in pas.plugins.listPlugins(ILocalRolesPlugin):
-                for adapter in lrmanager._getAdapters(obj):
-                    for principal_id in principal_ids:
-                        roles.update(adapter.getRoles(principal_id))
-            return list(roles)
+            return list(_get_local_roles(obj, principal_ids))
     else:
         return user.getRoles()
 
 
+def _get_member(user_id):
+    """Get a member by its id, looking it up only once per request.
+
+    The plone.api functions changing users, groups or roles drop the cached
+    members.
+    """
+    members = get_request_cache(_MEMBERS_CACHE)
+    member = members.get(user_id)
+    if member is None:
+        portal_membership = portal.get_tool('portal_membership')
+        member = portal_membership.getMemberById(user_id)
+        if member is not None:
+            members[user_id] = member
+    return member
+
+
+def _invalidate_members():
+    """Drop the members cached for the current request."""
+    get_request_cache(_MEMBERS_CACHE).clear()
+
+
+def _get_local_roles(obj, principal_ids):
+    """Get the roles granted to the principals on obj by local role adapters.
+
+    The adapters of an object are looked up once per request, until the
+    component registry changes, and then answer for all principals.
+    """
+    adapters = getSiteManager().adapters
+    cache = get_request_cache(_LOCAL_ROLES_CACHE)
+    if cache.get('generation') != adapters._generation:
+        cache.clear()
+        cache['generation'] = adapters._generation
+
+    # The object is kept in the cache, so the ids can not be reused.
+    key = tuple(id(aq_base(ob)) for ob in aq_chain(obj))
+    cached = cache.get(key)
+    if cached is None:
+        pas = portal.get_tool('acl_users')
+        local_role_adapters = [
+            adapter
+            for _, lrmanager in pas.plugins.listPlugins(ILocalRolesPlugin)
+            for adapter in lrmanager._getAdapters(obj)
+        ]
+        cached = cache[key] = (obj, local_role_adapters)
+
+    roles = set()
+    for adapter in cached[1]:
+        for principal_id in principal_ids:
+            roles.update(adapter.getRoles(principal_id))
+    return roles
+
+
 @contextmanager
 def _nop_context_manager():
     """A trivial context manager that does nothing."""
@@ -270,7 +630,13 @@ def _nop_context_manager():
 
 
 @mutually_exclusive_parameters('username', 'user')
-def get_permissions(username=None, user=None, obj=None):
+def get_permissions(
+    username=None,
+    user=None,
+    obj=None,
+    permissions=None,
+    lazy=False,
+):
     """Get user's site-wide or local permissions.
 
     Arguments ``username`` and ``user`` are mutually exclusive. You
@@ -285,6 +651,14 @@ def get_permissions(username=None, user=None, obj=None):
     :param obj: If obj is set then check the permissions on this context.
         If obj is not given, the site root will be used.
     :type obj: content object
+    :param permissions: Only check these permissions. If not given, all
+        permissions are checked.
+    :type permissions: list of strings
+    :param lazy: If True, return a mapping which only checks a permission
+        when it is looked up.
+    :type lazy: bool
+    :returns: Mapping of permission to whether the user has it
+    :rtype: dict
     :raises:
         InvalidParameterError
     :Example: :ref:`user_get_permissions_example`
@@ -292,16 +666,90 @@ def get_permissions(username=None, user=None, obj=None):
     if obj is None:
         obj = portal.get()
 
+    if permissions is None:
+        permissions = [record[0] for record in getPermissions()]
+
     if username is None and user is None:
-        context = _nop_context_manager()
+        checker = _SecurityManagerPermissionChecker(getSecurityManager(), obj)
     else:
-        context = env.adopt_user(username, user)
+        checker = _RolesPermissionChecker(
+            env._get_wrapped_user(username=username, user=user),
+            obj,
+        )
 
-    with context:
-        sm = getSecurityManager()
-        pms = (record[0] for record in getPermissions())
-        result = {pm: bool(sm.checkPermission(pm, obj)) for pm in pms}
-    return result
+    result = _LazyPermissions(permissions, checker)
+    if lazy:
+        return result
+    return dict(result.items())
+
+
+class _SecurityManagerPermissionChecker(object):
+    """Check permissions on an object through a security manager."""
+
+    def __init__(self, security_manager, obj):
+        self.security_manager = security_manager
+        self.obj = obj
+
+    def __call__(self, permission):
+        checkPermission = self.security_manager.checkPermission
+        return bool(checkPermission(permission, self.obj))
+
+
+class _RolesPermissionChecker(object):
+    """Check permissions of a user on an object.
+
+    The roles of the user in the context of the object are computed only
+    once, then each permission is granted if one of its roles on the object
+    is among them. That is what the security policy does for a user that
+    runs no restricted code, without looking up the local roles again for
+    every permission.
+    """
+
+    def __init__(self, user, obj):
+        self.user = user
+        self.obj = obj
+        self._roles = None
+
+    @property
+    def roles(self):
+        if self._roles is None:
+            self._roles = set(self.user.getRolesInContext(self.obj))
+            # Everybody is anonymous
+            self._roles.add('Anonymous')
+        return self._roles
+
+    def __call__(self, permission):
+        roles = rolesForPermissionOn(permission, self.obj)
+        if isinstance(roles, basestring):
+            roles = [roles]
+        return not self.roles.isdisjoint(roles)
+
+
+class _LazyPermissions(Mapping):
+    """Mapping of permission to whether it is granted, checking each
+    permission on first access.
+    """
+
+    def __init__(self, permissions, checker):
+        self._permissions = list(permissions)
+        self._names = frozenset(self._permissions)
+        self._checker = checker
+        self._results = {}
+
+    def __getitem__(self, permission):
+        if permission not in self._names:
+            raise KeyError(permission)
+        try:
+            return self._results[permission]
+        except KeyError:
+            result = self._results[permission] = self._checker(permission)
+            return result
+
+    def __iter__(self):
+        return iter(self._permissions)
+
+    def __len__(self):
+        return len(self._permissions)
 
 
 @mutually_exclusive_parameters('username', 'user')
@@ -339,6 +787,49 @@ def has_permission(permission, username=None, user=None, obj=None):
         return bool(getSecurityManager().checkPermission(permission, obj))
 
 
+@required_parameters('permission', 'users', 'objects')
+def permission_matrix(permission=None, users=None, objects=None):
+    """Check a permission for many users on many objects.
+
+    Every user is looked up only once and the roles that have the
+    permission on an object are computed only once for all users.
+
+    :param permission: [required] The permission you wish to check
+    :type permission: string
+    :param users: [required] Users, or usernames of users, for which to
+        check the permission.
+    :type users: List of MemberData objects or strings
+    :param objects: [required] Objects on which to check the permission.
+    :type objects: List of content objects
+    :raises:
+        UserNotFoundError
+    :returns: An integer for every user, in the given order. Bit ``i`` of
+        it is set if the user has the permission on ``objects[i]``.
+    :rtype: list of integers
+    :Example: :ref:`user_permission_matrix_example`
+    """
+    objects = list(objects)
+    object_roles = []
+    for obj in objects:
+        roles = rolesForPermissionOn(permission, obj)
+        if isinstance(roles, basestring):
+            roles = [roles]
+        object_roles.append(roles)
+
+    matrix = []
+    for user in users:
+        if isinstance(user, basestring):
+            acl_user = env._get_wrapped_user(username=user)
+        else:
+            acl_user = env._get_wrapped_user(user=user)
+        bits = 0
+        for index, obj in enumerate(objects):
+            if acl_user.allowed(obj, object_roles[index]):
+                bits |= 1 << index
+        matrix.append(bits)
+    return matrix
+
+
 @required_parameters('roles')
 @mutually_exclusive_parameters('username', 'user')
 def grant_roles(username=None, user=None, obj=None, roles=None):
@@ -384,10 +875,67 @@ def grant_roles(username=None, user=None, obj=None, roles=None):
 
     if obj is None:
         user.setSecurityProfile(roles=roles)
+        _invalidate_members()
     else:
         obj.manage_setLocalRoles(user.getId(), roles)
 
 
+@required_parameters('objects', 'roles')
+@mutually_exclusive_parameters('username', 'user')
+@at_least_one_of('username', 'user')
+def grant_roles_many(username=None, user=None, objects=None, roles=None):
+    """Grant local roles to a user on many objects.
+
+    Arguments ``username`` and ``user`` are mutually exclusive. You
+    can either set one or the other, but not both.
+
+    Objects on which the user already has all of the roles are left alone.
+    Object security is reindexed once per topmost changed object.
+
+    :param username: Username of the user that will receive the granted roles.
+    :type username: string
+    :param user: User object that will receive the granted roles.
+    :type user: MemberData object
+    :param objects: [required] Objects to grant the roles on.
+    :type objects: List of content objects
+    :param roles: [required] List of roles to grant
+    :type roles: list of strings
+    :raises:
+        InvalidParameterError
+        MissingParameterError
+    :Example: :ref:`user_grant_roles_many_example`
+    """
+    if user is None:
+        user = get(username=username)
+    # check we got a user
+    if user is None:
+        raise InvalidParameterError('User could not be found')
+
+    # These roles cannot be granted
+    if 'Anonymous' in roles or 'Authenticated' in roles:
+        raise InvalidParameterError
+
+    _grant_local_roles(user.getId(), objects, roles)
+
+
+def _grant_local_roles(principal_id, objects, roles):
+    """Grant local roles to a user or group on many objects.
+
+    Only objects where the principal misses one of the roles are changed,
+    and their security is reindexed once per topmost object.
+    """
+    roles = set(roles)
+    changed = []
+    for obj in objects:
+        # only roles persistent on the object, not from other providers
+        actual_roles = set(obj.get_local_roles_for_userid(principal_id))
+        if roles <= actual_roles:
+            continue
+        obj.manage_setLocalRoles(principal_id, list(actual_roles | roles))
+        changed.append(obj)
+    _reindex_security(changed)
+
+
 @required_parameters('roles')
 @mutually_exclusive_parameters('username', 'user')
 def revoke_roles(username=None, user=None, obj=None, roles=None):
@@ -436,6 +984,7 @@ def revoke_roles(username=None, user=None, obj=None, roles=None):
 
     if obj is None:
         user.setSecurityProfile(roles=roles)
+        _invalidate_members()
     elif not roles:
         obj.manage_delLocalRoles([user.getId()])
     else: